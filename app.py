@@ -1,23 +1,336 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from trading_strategy import get_stock_data, calculate_moving_averages, identify_golden_cross, implement_strategy, main
+import numpy as np
+from trading_strategy import get_stock_data, calculate_moving_averages, identify_golden_cross, run_backtest, StrategyConfig, DEFAULT_CONFIG, main
+import market_data
+from instrumentation import RunProfile, summarize_report
+from chart_data import downsample_frame
+from indicators import IndicatorGraph
+from portfolio import simulate_portfolio, portfolio_summary
+from robustness import bootstrap_trades
+from performance import performance_metrics, equity_curve
+from trade_stats import partial_stats, merge_stats, summarize_stats
+from jobs import JobRunner
+import result_store
 
 st.set_page_config(page_title="Golden Cross Trading Dashboard", layout="wide")
 
-def load_custom_data(tickers):
-    """Load data for custom tickers"""
-    positions = main(tickers)
-    return positions
+# Memoization limits shared by all cached computations
+CACHE_MAX_ENTRIES = 32
+CACHE_TTL = 3600
+CHART_POINTS = 2000
+ANALYSIS_PERIOD = "5y"
+JOB_WORKERS = 4
+JOB_POLL_SECONDS = 1.0
+PRICE_OVERLAYS = ["EMA 20", "Bollinger Bands (20, 2)"]
+OSCILLATORS = ["RSI 14", "MACD (12, 26, 9)", "ATR 14"]
+
+class BoundedCache:
+    """Small LRU cache with a TTL for results that are built alongside UI elements"""
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+def get_pyplot():
+    """matplotlib is imported on first use, so pages without charts start faster"""
+    import matplotlib.pyplot as plt
+    return plt
+
+@st.cache_resource
+def get_backtest_cache():
+    """Backtest results shared across sessions, keyed by tickers, period and parameters"""
+    return BoundedCache()
+
+@st.cache_resource
+def get_job_runner():
+    """Background worker pool for backtests, shared by every session on this server"""
+    return JobRunner(max_workers=JOB_WORKERS)
 
-def get_chart_data(ticker):
+@st.cache_resource
+def get_data_provider(source_key):
+    """Market-data provider of a source ("yahoo" or "local:<dir>"), passed explicitly instead of set globally"""
+    if source_key.startswith("local:"):
+        return market_data.LocalFileProvider(source_key[len("local:"):])
+    return market_data.YFinanceProvider()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def load_custom_data(tickers, source_key):
+    """Load data for custom tickers, with the run's per-stage profile"""
+    with RunProfile() as profile:
+        positions = main(list(tickers), provider=get_data_provider(source_key), period=ANALYSIS_PERIOD,
+                         profile=profile, store=result_store.get_store())
+    return positions, profile.report()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def get_chart_data(ticker, source_key):
     """Get price and MA data for chart display"""
-    data = get_stock_data(ticker)
+    data = get_stock_data(ticker, provider=get_data_provider(source_key))
     if data is not None:
         data = calculate_moving_averages(data)
         data = identify_golden_cross(data)
     return data
 
+def show_run_profile(report, container=st):
+    """Collapsible per-stage / per-ticker timing breakdown of a run"""
+    with container.expander("⏱️ Run profile"):
+        if report.empty:
+            st.write("No profile recorded for this run.")
+            return
+        st.caption(f"Total stage time: {report['seconds'].sum():.3f}s")
+        st.dataframe(summarize_report(report, "stage").round(4))
+        st.dataframe(report.pivot_table(index="ticker", columns="stage", values="seconds",
+                                        aggfunc="sum").round(4))
+
+def stock_stats(positions):
+    """Per-ticker summary table and portfolio totals, merged from per-ticker partial stats"""
+    ticker_stats = partial_stats(positions, "Ticker")
+    overall = summarize_stats(merge_stats(ticker_stats, by=[])).iloc[0]
+    per_stock = summarize_stats(ticker_stats).sort_index()
+    per_stock.index = per_stock.index.astype(str)
+    return per_stock, overall
+
+def indicator_columns(data, names):
+    """Chart columns for the selected overlays and oscillators, from one shared indicator graph"""
+    graph = IndicatorGraph(data)
+    columns = {}
+    if "EMA 20" in names:
+        columns['EMA20'] = graph.ema(20)
+    if "Bollinger Bands (20, 2)" in names:
+        _, columns['BB Upper'], columns['BB Lower'] = graph.bollinger(20, 2.0)
+    if "RSI 14" in names:
+        columns['RSI'] = graph.rsi(14)
+    if "MACD (12, 26, 9)" in names:
+        columns['MACD'], columns['MACD Signal'], _ = graph.macd(12, 26, 9)
+    if "ATR 14" in names:
+        columns['ATR'] = graph.atr(14)
+    return data.assign(**columns)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def render_price_chart(ticker, source_key, sell_dates, sell_prices, n_points=CHART_POINTS, indicators=()):
+    """Render the price/MA chart to PNG, downsampled to screen resolution with markers kept"""
+    chart_data = get_chart_data(ticker, source_key)
+    # Indicators need the full history; only the finished columns are downsampled
+    if indicators:
+        chart_data = indicator_columns(chart_data, indicators)
+    if n_points is not None:
+        chart_data = downsample_frame(chart_data, sell_dates, n_points)
+    
+    plt = get_pyplot()
+    oscillators = [name for name in OSCILLATORS if name in indicators]
+    fig, axes = plt.subplots(1 + len(oscillators), 1, figsize=(14, 6 + 2.5 * len(oscillators)), sharex=True,
+                             squeeze=False, gridspec_kw={'height_ratios': [3] + [1] * len(oscillators)})
+    ax = axes[0, 0]
+    ax.plot(chart_data.index, chart_data['Close'], label='Close Price', color='blue', linewidth=1)
+    ax.plot(chart_data.index, chart_data['MA50'], label='MA50', color='orange', linewidth=1)
+    ax.plot(chart_data.index, chart_data['MA200'], label='MA200', color='green', linewidth=1)
+    if 'EMA20' in chart_data:
+        ax.plot(chart_data.index, chart_data['EMA20'], label='EMA20', color='purple', linewidth=1)
+    if 'BB Upper' in chart_data:
+        ax.fill_between(chart_data.index, chart_data['BB Lower'], chart_data['BB Upper'], color='gray', alpha=0.15,
+                        label='Bollinger Bands')
+
+    # Buy points (Golden Cross)
+    buy_points = chart_data[chart_data['GoldenCross']]
+    ax.scatter(buy_points.index, buy_points['Close'], color='green', label='Buy Signal', marker='^', s=100)
+
+    # Sell points (from positions)
+    if sell_dates:
+        ax.scatter(list(sell_dates), list(sell_prices), color='red', label='Sell Point', marker='v', s=100)
+
+    ax.set_ylabel('Price ($)')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    ax.set_title(f'{ticker} - Price Chart')
+
+    for panel, name in zip(axes[1:, 0], oscillators):
+        if name == "RSI 14":
+            panel.plot(chart_data.index, chart_data['RSI'], color='purple', linewidth=1)
+            panel.axhline(70, color='red', linestyle='--', linewidth=0.8)
+            panel.axhline(30, color='green', linestyle='--', linewidth=0.8)
+            panel.set_ylim(0, 100)
+        elif name == "MACD (12, 26, 9)":
+            panel.plot(chart_data.index, chart_data['MACD'], label='MACD', color='blue', linewidth=1)
+            panel.plot(chart_data.index, chart_data['MACD Signal'], label='Signal', color='orange', linewidth=1)
+            panel.legend(loc='upper left')
+        else:
+            panel.plot(chart_data.index, chart_data['ATR'], color='brown', linewidth=1)
+        panel.set_ylabel(name.split(' ')[0])
+        panel.grid(True, alpha=0.3)
+    axes[-1, 0].set_xlabel('Date')
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def robustness_table(profit_pct, n_resamples, method, seed=42):
+    """Bootstrap / permutation confidence intervals for a trade sequence"""
+    return bootstrap_trades(np.asarray(profit_pct), n_resamples, seed=seed, method=method)
+
+def show_robustness(trades, key):
+    """Robustness section: confidence intervals instead of point estimates"""
+    st.subheader("🎲 Robustness (Monte Carlo)")
+    col1, col2 = st.columns(2)
+    with col1:
+        n_resamples = st.select_slider("Resamples", [1000, 10000, 100000], value=10000, key=f"{key}_resamples")
+    with col2:
+        method = st.radio("Method", ["bootstrap", "permutation"], horizontal=True, key=f"{key}_method")
+    # Trades are ordered by exit date so drawdowns follow the realized sequence
+    profit_pct = tuple(trades.sort_values('SellDate')['ProfitPct'])
+    table = robustness_table(profit_pct, n_resamples, method)
+    st.dataframe(table.round(2))
+    st.caption("95% intervals from resampled trade sequences; max drawdown compounds trades one after another.")
+
+def show_performance(trades):
+    """Equity curve, drawdown and risk-adjusted returns of the trades, overall and per stock"""
+    st.subheader("📉 Risk & Performance")
+    overall = performance_metrics(trades, by=[])
+    if overall.empty:
+        return
+    overall = overall.iloc[0]
+    col1, col2, col3, col4, col5 = st.columns(5)
+    if pd.isna(overall['CAGR']):
+        # Spans under MIN_CAGR_DAYS are not annualized
+        col1.metric("Total Return", f"{overall['TotalReturn']:.2f}%")
+    else:
+        col1.metric("CAGR", f"{overall['CAGR']:.2f}%")
+    col2.metric("Max Drawdown", f"{overall['MaxDrawdown']:.2f}%")
+    col3.metric("Sharpe", f"{overall['Sharpe']:.2f}")
+    col4.metric("Sortino", f"{overall['Sortino']:.2f}")
+    col5.metric("Exposure", f"{overall['Exposure']:.1f}%")
+    curve = equity_curve(trades)
+    chart_col1, chart_col2 = st.columns(2)
+    chart_col1.line_chart(curve['Equity'])
+    chart_col2.area_chart(curve['Drawdown'])
+    per_stock = performance_metrics(trades.assign(Ticker=trades['Ticker'].astype(str)), "Ticker")
+    st.dataframe(per_stock.set_index("Ticker").sort_index().round(2))
+    st.caption("Equal-weight sleeve of the open trades, each trade's return spread evenly over its holding days "
+               "(so price swings inside a trade are smoothed out and Sharpe/Sortino read high); annualized from "
+               "daily returns with a zero risk-free rate.")
+
+def stored_backtest(tickers, config, period, interval, provider):
+    """Stored results of this exact run on the current data, or None"""
+    return result_store.load_run(result_store.get_store(), provider, tickers, config, period, interval)
+
+def run_custom_strategy(job, tickers, config, period, interval, provider, cache, cache_key):
+    """Backtest job: fetch and analyze each ticker, reporting progress to the job"""
+    profile = RunProfile()
+    results = {}
+    failed_tickers = []
+    
+    # Fetch concurrently under a shared rate limit and analyze each ticker as it arrives
+    fetches = market_data.fetch_many(tickers, period, provider, profile=profile, interval=interval)
+    for i, (ticker, data, error) in enumerate(fetches):
+        job.report(i / len(tickers), f"Analyzing {ticker}... ({i+1}/{len(tickers)})")
+        try:
+            if data is None or data.empty:
+                failed_tickers.append(ticker)
+                continue
+            
+            positions = run_backtest(data, config, profile, ticker)
+            if not positions.empty:
+                positions.insert(0, 'Ticker', ticker)
+                results[ticker] = positions
+        except Exception:
+            failed_tickers.append(ticker)
+    
+    if results:
+        # Concatenate in input order rather than download-completion order
+        backtest_results = pd.concat([results[t] for t in tickers if t in results], ignore_index=True)
+    else:
+        backtest_results = pd.DataFrame()
+    result = (backtest_results, profile.report(), failed_tickers)
+    cache.put(cache_key, result)
+    # Only complete runs are persisted, so a rate-limited fetch is retried next time
+    if not failed_tickers:
+        result_store.store_run(result_store.get_store(), provider, tickers, backtest_results, config, period, interval)
+    job.report(1.0, "Analysis complete!")
+    return result
+
+def show_backtest_jobs(job_ids):
+    """This session's backtest jobs with progress, cancel and show-results controls"""
+    jobs = get_job_runner().list_jobs(job_ids)
+    if not jobs:
+        return
+    st.subheader("🧵 Backtest Jobs")
+    for job in reversed(jobs):
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"**{job.label}** · `{job.id}` · {job.status} · {job.elapsed():.1f}s")
+            if not job.done:
+                st.progress(job.progress, text=job.message or "Waiting for a worker...")
+            elif job.status == "failed":
+                st.error(f"❌ Backtesting failed: {job.error}")
+                st.info("""
+                **🔧 Possible solutions:**
+                - Reduce the number of stocks
+                - Try again in a few moments (Yahoo Finance rate limits)
+                - Check your internet connection
+                - Verify the stock tickers are valid
+                - Try with popular US stocks first
+                """)
+        with col2:
+            if not job.done:
+                if st.button("✖ Cancel", key=f"cancel_{job.id}", disabled=job.cancel_requested):
+                    get_job_runner().cancel(job.id)
+                    st.rerun()
+            elif job.status == "done":
+                if st.button("Show results", key=f"show_{job.id}"):
+                    st.session_state.backtest_selected = job.key
+
+def stored_analysis(tickers, provider):
+    """Stored result of the default analysis on the current data, without downloading anything"""
+    return stored_backtest(list(tickers), DEFAULT_CONFIG, ANALYSIS_PERIOD, "1d", provider)
+
+def initial_analysis(job, tickers, provider):
+    """Background job for the analysis shown before "Start Analysis" is clicked"""
+    job.report(0.0, f"Analyzing {len(tickers)} stocks...")
+    with RunProfile() as profile:
+        positions = main(list(tickers), provider=provider, period=ANALYSIS_PERIOD, profile=profile,
+                         store=result_store.get_store())
+    return positions, profile.report()
+
+def refresh_data():
+    """Drop all memoized results and force the next fetch to go upstream"""
+    load_custom_data.clear()
+    get_chart_data.clear()
+    render_price_chart.clear()
+    get_backtest_cache().clear()
+    market_data.default_cache.expire()
+    # A finished initial-analysis job holds the old data; the next run must not reuse it
+    st.session_state.pop('analysis_job', None)
+    st.session_state.data_generation = st.session_state.get('data_generation', 0) + 1
+
 # Sidebar for stock selection
 st.sidebar.title("Stock Selection")
 
@@ -31,6 +344,16 @@ user_tickers_input = st.sidebar.text_input(
     value=", ".join(default_tickers)
 )
 
+# Market data source
+st.sidebar.subheader("Data Source")
+data_source = st.sidebar.radio("Price data", ["Yahoo Finance", "Local files"], key="data_source")
+if data_source == "Local files":
+    data_dir = st.sidebar.text_input("Data directory (TICKER.csv / .parquet / .feather)", value="data")
+    source_key = f"local:{data_dir}"
+else:
+    source_key = "yahoo"
+provider = get_data_provider(source_key)
+
 # Process user input
 if user_tickers_input:
     user_tickers = [ticker.strip().upper() for ticker in user_tickers_input.split(",") if ticker.strip()]
@@ -40,17 +363,43 @@ else:
 
 # Initialize positions
 positions = pd.DataFrame()
+run_report = pd.DataFrame()
+
+# Refresh button: re-download prices and recompute everything on the next run
+if st.sidebar.button("🔄 Refresh Data"):
+    refresh_data()
 
 # Run analysis button
+analysis_key = (tuple(user_tickers), source_key)
 if st.sidebar.button("Start Analysis"):
     with st.spinner(f"Analyzing {len(user_tickers)} stocks: {', '.join(user_tickers)}"):
-        positions = load_custom_data(user_tickers)
+        positions, run_report = load_custom_data(tuple(user_tickers), source_key)
+    st.session_state.analysis_ready = analysis_key
+elif st.session_state.get('analysis_ready') == analysis_key:
+    # Analysis already run in this session (cached, so reruns are instant)
+    positions, run_report = load_custom_data(tuple(user_tickers), source_key)
 else:
-    # Use default analysis on initial load
-    try:
-        positions = load_custom_data(user_tickers)
-    except:
-        positions = pd.DataFrame()
+    # First load renders from stored results; otherwise the analysis runs in the background
+    stored = stored_analysis(user_tickers, provider)
+    if stored is not None:
+        positions = stored
+    else:
+        # Keyed by the refresh count too, and a finished job is only reused while the cached
+        # prices it ran on are fresh, so a store miss after a refresh or expiry re-downloads
+        job_key = ("analysis",) + analysis_key + (st.session_state.get('data_generation', 0),)
+        job = get_job_runner().get(st.session_state.get('analysis_job'))
+        if (job is None or job.key != job_key
+                or job.done and time.time() - job.finished >= market_data.default_cache.ttl):
+            job_id = get_job_runner().submit(initial_analysis, tuple(user_tickers), provider,
+                                             label="Initial analysis", key=job_key)
+            st.session_state.analysis_job = job_id
+            job = get_job_runner().get(job_id)
+        if job.status == "done":
+            positions, run_report = job.result
+        elif not job.done:
+            st.sidebar.info(f"⏳ Initial analysis of {', '.join(user_tickers)} is running in the background.")
+        elif job.status == "failed":
+            st.sidebar.warning(f"Initial analysis failed: {job.error}")
 
 # Sidebar navigation
 page = st.sidebar.radio("Select Page", 
@@ -59,6 +408,8 @@ page = st.sidebar.radio("Select Page",
                         "Detailed Trades", 
                         "Backtesting Module"])
 
+show_run_profile(run_report, st.sidebar)
+
 if page == "Price Chart":
     st.title("Price Chart with Golden Cross Signals")
     
@@ -66,31 +417,20 @@ if page == "Price Chart":
         available_tickers = positions['Ticker'].unique()
         selected_ticker = st.selectbox("Select Ticker", available_tickers)
         
-        chart_data = get_chart_data(selected_ticker)
+        chart_data = get_chart_data(selected_ticker, source_key)
         if chart_data is not None:
-            fig, ax = plt.subplots(figsize=(14, 6))
-            ax.plot(chart_data.index, chart_data['Close'], label='Close Price', color='blue', linewidth=1)
-            ax.plot(chart_data.index, chart_data['MA50'], label='MA50', color='orange', linewidth=1)
-            ax.plot(chart_data.index, chart_data['MA200'], label='MA200', color='green', linewidth=1)
-
-            # Buy points (Golden Cross)
-            buy_points = chart_data[chart_data['GoldenCross']]
-            ax.scatter(buy_points.index, buy_points['Close'], color='green', label='Buy Signal', marker='^', s=100)
-
             # Filter positions for selected ticker
             ticker_positions = positions[positions['Ticker'] == selected_ticker]
+            buy_points = chart_data[chart_data['GoldenCross']]
             
-            # Sell points (from positions)
-            if not ticker_positions.empty:
-                ax.scatter(ticker_positions['SellDate'], ticker_positions['SellPrice'], 
-                          color='red', label='Sell Point', marker='v', s=100)
-
-            ax.set_xlabel('Date')
-            ax.set_ylabel('Price ($)')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.set_title(f'{selected_ticker} - Price Chart')
-            st.pyplot(fig)
+            indicators = st.multiselect("Indicators", PRICE_OVERLAYS + OSCILLATORS, default=[])
+            full_resolution = st.checkbox("Full resolution (slow on long histories)", value=False)
+            chart_png = render_price_chart(
+                selected_ticker, source_key,
+                tuple(ticker_positions['SellDate']), tuple(ticker_positions['SellPrice']),
+                None if full_resolution else CHART_POINTS, tuple(indicators)
+            )
+            st.image(chart_png, use_container_width=True)
             
             # Show signals summary
             st.subheader("Signals Summary")
@@ -117,12 +457,13 @@ elif page == "Trade Statistics":
         # Overall portfolio statistics
         st.subheader("Portfolio Overview")
         
-        total_trades = len(positions)
-        win_trades = len(positions[positions['ProfitPct'] > 0])
+        per_stock, overall = stock_stats(positions)
+        total_trades = int(overall['Trades'])
+        win_trades = int(overall['WinTrades'])
         loss_trades = total_trades - win_trades
-        win_rate = win_trades / total_trades * 100 if total_trades > 0 else 0
-        avg_profit = positions['ProfitPct'].mean()
-        avg_holding = positions['HoldingDays'].mean()
+        win_rate = overall['WinRate']
+        avg_profit = overall['AvgProfit']
+        avg_holding = overall['AvgHoldingDays']
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -137,18 +478,39 @@ elif page == "Trade Statistics":
         with col4:
             total_stocks = positions['Ticker'].nunique()
             st.metric("Stocks Analyzed", total_stocks)
-            st.metric("Analysis Period", period)
+            st.metric("Analysis Period", ANALYSIS_PERIOD)
+
+        # Shared-capital portfolio simulation
+        st.subheader("Portfolio Simulation")
+        sim_col1, sim_col2, sim_col3 = st.columns(3)
+        with sim_col1:
+            initial_capital = st.number_input("Initial Capital ($)", min_value=1000.0, value=100000.0, step=1000.0)
+        with sim_col2:
+            position_size_pct = st.number_input("Position Size (% of equity)", min_value=1.0, max_value=100.0, value=10.0)
+        with sim_col3:
+            max_positions = st.number_input("Max Concurrent Positions", min_value=1, max_value=100, value=10)
+        
+        sim_trades, equity = simulate_portfolio(positions, initial_capital, position_size_pct / 100, int(max_positions))
+        summary = portfolio_summary(sim_trades, equity, initial_capital, signals=len(positions))
+        if summary:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Final Equity", f"${summary['Final Equity']:,.0f}")
+            col2.metric("Total Return", f"{summary['Total Return (%)']:.2f}%")
+            col3.metric("Trades Taken", summary["Trades Taken"])
+            col4.metric("Signals Skipped", summary["Signals Skipped"])
+            st.line_chart(equity)
 
         # Portfolio allocation pie chart
         st.subheader("Portfolio Allocation")
+        plt = get_pyplot()
         col1, col2 = st.columns(2)
         
         with col1:
-            alloc = positions.groupby("Ticker")['BuyPrice'].sum()
+            alloc = sim_trades.groupby("Ticker")['Allocation'].sum() if not sim_trades.empty else pd.Series(dtype=float)
             if not alloc.empty:
                 fig1, ax1 = plt.subplots()
                 ax1.pie(alloc, labels=alloc.index, autopct='%1.1f%%', startangle=90)
-                ax1.set_title("Allocation by Buy Price")
+                ax1.set_title("Capital Allocated by Stock (simulated)")
                 st.pyplot(fig1)
         
         with col2:
@@ -164,13 +526,13 @@ elif page == "Trade Statistics":
         # Per-stock performance
         st.subheader("Per-Stock Performance")
         if "Ticker" in positions.columns:
-            per_stock = positions.groupby("Ticker").agg({
-                'ProfitPct': ['mean', 'count', 'std'],
-                'HoldingDays': 'mean'
-            }).round(2)
+            per_stock = per_stock[['AvgProfit', 'Trades', 'StdProfit', 'AvgHoldingDays']].round(2)
             per_stock.columns = ['Avg Profit (%)', 'Trade Count', 'Std Dev', 'Avg Holding Days']
             st.dataframe(per_stock)
 
+        show_performance(positions)
+        show_robustness(positions, "stats")
+
 elif page == "Detailed Trades":
     st.title("Detailed Trades Record")
     
@@ -214,7 +576,7 @@ elif page == "Backtesting Module":
     st.title("Customizable Strategy Backtesting")
     st.write("Select strategy parameters and run backtests across your portfolio.")
     
-    st.info("**Note:** Maximum 5 stocks per backtest due to Yahoo Finance restrictions")
+    st.info("**Note:** Downloads are rate-limited to stay within Yahoo Finance restrictions; large ticker lists take longer on the first run")
 
     # User input for custom tickers in backtesting
     st.subheader("Stock Selection")
@@ -223,7 +585,7 @@ elif page == "Backtesting Module":
     
     with col1:
         backtest_tickers_input = st.text_input(
-            "Enter stock tickers (comma separated, max 5)",
+            "Enter stock tickers (comma separated)",
             value="MSFT, AAPL, TSLA",
             help="Examples: MSFT, AAPL, TSLA, GOOGL, AMZN, NVDA, META, NFLX, 0005.HK"
         )
@@ -237,10 +599,6 @@ elif page == "Backtesting Module":
     # Process user input for backtesting
     if backtest_tickers_input:
         backtest_tickers = [ticker.strip().upper() for ticker in backtest_tickers_input.split(",") if ticker.strip()]
-        # Limit to first 5 stocks
-        if len(backtest_tickers) > 5:
-            st.warning(f"Limited to first 5 stocks: {', '.join(backtest_tickers[:5])}")
-            backtest_tickers = backtest_tickers[:5]
     else:
         backtest_tickers = ["MSFT", "AAPL", "TSLA"]
 
@@ -256,12 +614,23 @@ elif page == "Backtesting Module":
     with col1:
         ma_short = st.number_input("Short Moving Average Window", min_value=5, max_value=100, value=50, key="backtest_ma_short")
         ma_long = st.number_input("Long Moving Average Window", min_value=20, max_value=300, value=200, key="backtest_ma_long")
-        holding_period = st.number_input("Max Holding Period (days)", min_value=5, max_value=180, value=60, key="backtest_holding")
+        holding_unit = st.radio("Holding Period Unit", ["days", "bars"], horizontal=True, key="backtest_holding_unit",
+                                help="Calendar days after the entry, or a number of bars (useful for intraday data)")
+        holding_period = st.number_input(f"Max Holding Period ({holding_unit})", min_value=1, max_value=5000, value=60, key="backtest_holding")
     
     with col2:
         stop_loss_pct = st.number_input("Stop-Loss (%)", min_value=1.0, max_value=50.0, value=10.0, key="backtest_stop_loss")
         take_profit_pct = st.number_input("Take-Profit (%)", min_value=1.0, max_value=100.0, value=15.0, key="backtest_take_profit")
-        period_backtest = st.selectbox("Data Period", ["6mo", "1y", "2y", "5y", "max"], index=3, key="backtest_period")
+        trailing_stop_pct = st.number_input("Trailing Stop (%)", min_value=0.0, max_value=50.0, value=0.0, key="backtest_trailing_stop",
+                                            help="Exit once the price falls this far below its high since entry (0 = off)")
+        exit_mode = st.radio("Exit Prices", ["close", "intrabar"], horizontal=True, key="backtest_exit_mode",
+                             help="Trigger exits on closing prices, or on each bar's high/low with fills at the stop or "
+                                  "target level (or the open, when the bar gaps through it)")
+        interval_backtest = st.selectbox("Bar Size", ["1d", "1h", "30m", "15m", "5m", "1m"], index=0, key="backtest_interval")
+        period_backtest = st.selectbox("Data Period", ["5d", "1mo", "60d", "6mo", "1y", "2y", "5y", "max"], index=6, key="backtest_period")
+        if interval_backtest != "1d":
+            st.caption("Yahoo Finance keeps about 7 days of 1m bars, 60 days of 5m-30m bars and 2 years of 1h bars; "
+                       "moving-average windows are counted in bars.")
 
     # Strategy parameter presets
     st.subheader("Quick Strategy Presets")
@@ -316,243 +685,157 @@ elif page == "Backtesting Module":
     if 'backtest_take_profit' not in st.session_state:
         st.session_state.backtest_take_profit = 15.0
 
-    # Complete Backtesting function
-    def run_custom_strategy(tickers, ma_short, ma_long, holding_period, stop_loss_pct, take_profit_pct, period="5y"):
-        results = []
-        successful_tickers = []
-        failed_tickers = []
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for i, ticker in enumerate(tickers):
-            try:
-                # Update progress
-                progress = (i / len(tickers))
-                progress_bar.progress(progress)
-                status_text.text(f"Analyzing {ticker}... ({i+1}/{len(tickers)})")
-                
-                # Add delay to avoid rate limiting
-                import time
-                time.sleep(0.5)
-                
-                data = get_stock_data(ticker, period)
-                if data is None or data.empty:
-                    failed_tickers.append(ticker)
-                    continue
-                
-                # Custom moving averages
-                data['MA_short'] = data['Close'].rolling(window=int(ma_short)).mean()
-                data['MA_long'] = data['Close'].rolling(window=int(ma_long)).mean()
-                
-                # Custom golden cross
-                data['GoldenCross'] = (data['MA_short'] > data['MA_long']) & (data['MA_short'].shift(1) <= data['MA_long'].shift(1))
-                
-                positions = []
-                
-                # Need enough data for the longer moving average
-                if len(data) >= ma_long:
-                    data = data.iloc[int(ma_long):].copy()
-                    buy_dates = data[data['GoldenCross'] == True].index.tolist()
-                    
-                    for buy_date in buy_dates:
-                        buy_price = data.loc[buy_date, 'Close']
-                        buy_open = data.loc[buy_date, 'Open']
-                        buy_high = data.loc[buy_date, 'High']
-                        buy_low = data.loc[buy_date, 'Low']
-                        
-                        target_price = buy_price * (1 + take_profit_pct/100)
-                        stop_loss_price = buy_price * (1 - stop_loss_pct/100)
-                        max_sell_date = buy_date + pd.Timedelta(days=int(holding_period))
-                        sell_period = data.loc[buy_date:max_sell_date].copy()
-                        
-                        # Check for stop-loss first
-                        stop_loss_hit = sell_period[sell_period['Close'] <= stop_loss_price]
-                        target_reached = sell_period[sell_period['Close'] >= target_price]
-
-                        if not stop_loss_hit.empty:
-                            sell_date = stop_loss_hit.index[0]
-                            sell_price = stop_loss_hit.loc[sell_date, 'Close']
-                            sell_open = data.loc[sell_date, 'Open']
-                            sell_high = data.loc[sell_date, 'High']
-                            sell_low = data.loc[sell_date, 'Low']
-                            sell_reason = "Stop-loss hit"
-                        elif not target_reached.empty:
-                            sell_date = target_reached.index[0]
-                            sell_price = target_reached.loc[sell_date, 'Close']
-                            sell_open = data.loc[sell_date, 'Open']
-                            sell_high = data.loc[sell_date, 'High']
-                            sell_low = data.loc[sell_date, 'Low']
-                            sell_reason = "Target reached"
-                        else:
-                            sell_date_candidates = sell_period.index.tolist()
-                            if sell_date_candidates:
-                                sell_date = sell_date_candidates[-1]
-                                sell_price = data.loc[sell_date, 'Close']
-                                sell_open = data.loc[sell_date, 'Open']
-                                sell_high = data.loc[sell_date, 'High']
-                                sell_low = data.loc[sell_date, 'Low']
-                                sell_reason = "Max holding period"
-                            else:
-                                continue
-
-                        holding_days = (sell_date - buy_date).days
-                        profit_pct = (sell_price / buy_price - 1) * 100
-                        
-                        positions.append({
-                            'Ticker': ticker,
-                            'BuyDate': buy_date,
-                            'BuyPrice': buy_price,
-                            'BuyOpen': buy_open,
-                            'BuyHigh': buy_high,
-                            'BuyLow': buy_low,
-                            'SellDate': sell_date,
-                            'SellPrice': sell_price,
-                            'SellOpen': sell_open,
-                            'SellHigh': sell_high,
-                            'SellLow': sell_low,
-                            'HoldingDays': holding_days,
-                            'ProfitPct': profit_pct,
-                            'SellReason': sell_reason
-                        })
-                
-                if positions:
-                    results.append(pd.DataFrame(positions))
-                    successful_tickers.append(ticker)
-                else:
-                    successful_tickers.append(ticker)  # Successfully analyzed but no trades
-                    
-            except Exception as e:
-                failed_tickers.append(ticker)
-                continue
-        
-        # Complete progress bar
-        progress_bar.progress(1.0)
-        status_text.text("Analysis complete!")
-        
-        # Show summary
-        if failed_tickers:
-            st.warning(f"Failed to analyze: {', '.join(failed_tickers)}")
-        
-        if results:
-            return pd.concat(results, ignore_index=True)
-        else:
-            return pd.DataFrame()
-
     # Run Backtest button
     st.markdown("---")
+    if 'backtest_jobs' not in st.session_state:
+        st.session_state.backtest_jobs = []
     if st.button("🚀 Run Backtest Analysis", type="primary", use_container_width=True):
         if not backtest_tickers:
             st.error("Please enter at least one stock ticker.")
         else:
-            try:
-                with st.spinner("Running backtest analysis... This may take a few moments"):
-                    backtest_results = run_custom_strategy(
-                        backtest_tickers, ma_short, ma_long, holding_period, 
-                        stop_loss_pct, take_profit_pct, period_backtest
-                    )
-                
-                if not backtest_results.empty:
-                    st.success(f"✅ Backtest completed! Found {len(backtest_results)} trades across {backtest_results['Ticker'].nunique()} stocks")
-                    
-                    # Display results
-                    st.subheader("📊 Backtest Results")
-                    
-                    # Summary metrics
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    total_trades = len(backtest_results)
-                    avg_profit = backtest_results['ProfitPct'].mean()
-                    win_rate = (backtest_results['ProfitPct'] > 0).mean() * 100
-                    avg_holding = backtest_results['HoldingDays'].mean()
-                    
-                    with col1:
-                        st.metric("Total Trades", total_trades)
-                        st.metric("Stocks Analyzed", backtest_results['Ticker'].nunique())
-                    
-                    with col2:
-                        st.metric("Average Profit (%)", f"{avg_profit:.2f}%")
-                        st.metric("Win Rate", f"{win_rate:.2f}%")
-                    
-                    with col3:
-                        win_trades = len(backtest_results[backtest_results['ProfitPct'] > 0])
-                        loss_trades = total_trades - win_trades
-                        st.metric("Winning Trades", win_trades)
-                        st.metric("Losing Trades", loss_trades)
-                    
-                    with col4:
-                        st.metric("Avg Holding Days", f"{avg_holding:.1f}")
-                        st.metric("Strategy", f"MA{ma_short}/{ma_long}")
-                    
-                    # Detailed results table
-                    st.subheader("📋 Detailed Trades")
-                    st.dataframe(backtest_results)
-                    
-                    # Performance by stock
-                    st.subheader("📈 Performance by Stock")
-                    stock_performance = backtest_results.groupby('Ticker').agg({
-                        'ProfitPct': ['mean', 'count', 'std'],
-                        'HoldingDays': 'mean',
-                        'BuyPrice': 'mean'
-                    }).round(2)
-                    stock_performance.columns = ['Avg Profit (%)', 'Trade Count', 'Std Dev', 'Avg Holding Days', 'Avg Buy Price']
-                    st.dataframe(stock_performance)
-                    
-                    # Visualizations
-                    col_viz1, col_viz2 = st.columns(2)
-                    
-                    with col_viz1:
-                        # Sell reason breakdown
-                        st.subheader("📊 Exit Reasons")
-                        sell_reasons = backtest_results['SellReason'].value_counts()
-                        fig1, ax1 = plt.subplots()
-                        ax1.pie(sell_reasons.values, labels=sell_reasons.index, autopct='%1.1f%%', startangle=90)
-                        ax1.set_title("Exit Reasons Distribution")
-                        st.pyplot(fig1)
-                    
-                    with col_viz2:
-                        # Profit distribution
-                        st.subheader("💰 Profit Distribution")
-                        fig2, ax2 = plt.subplots()
-                        ax2.hist(backtest_results['ProfitPct'], bins=20, alpha=0.7, color='skyblue')
-                        ax2.axvline(0, color='red', linestyle='--', label='Break-even')
-                        ax2.set_xlabel('Profit (%)')
-                        ax2.set_ylabel('Number of Trades')
-                        ax2.legend()
-                        st.pyplot(fig2)
-                    
-                    # Download button for backtest results
-                    st.subheader("💾 Export Results")
-                    csv_data = backtest_results.to_csv(index=False)
-                    st.download_button(
-                        "Download Backtest Results as CSV", 
-                        csv_data, 
-                        f"backtest_results_{ma_short}_{ma_long}.csv", 
-                        "text/csv",
-                        use_container_width=True
-                    )
-                    
+            backtest_key = (tuple(backtest_tickers), ma_short, ma_long, holding_period,
+                            stop_loss_pct, take_profit_pct, period_backtest, source_key,
+                            interval_backtest, holding_unit, exit_mode, trailing_stop_pct)
+            if get_backtest_cache().get(backtest_key) is None:
+                config = StrategyConfig(int(ma_short), int(ma_long), int(holding_period),
+                                        stop_loss_pct, take_profit_pct, holding_unit, exit_mode, trailing_stop_pct)
+                # Repeated runs on unchanged data are answered from the result store
+                stored = stored_backtest(backtest_tickers, config, period_backtest, interval_backtest, provider)
+                if stored is not None:
+                    get_backtest_cache().put(backtest_key, (stored, pd.DataFrame(), []))
                 else:
-                    st.warning("❌ No trades generated for the selected parameters and stocks.")
-                    st.info("""
-                    **💡 Suggestions to generate trades:**
-                    - Try different moving average periods
-                    - Adjust stop-loss and take-profit levels
-                    - Select different stocks or more stocks
-                    - Extend the analysis period
-                    - Use shorter moving averages for more signals
-                    """)
-                    
-            except Exception as e:
-                st.error(f"❌ Backtesting failed: {str(e)}")
-                st.info("""
-                **🔧 Possible solutions:**
-                - Reduce the number of stocks
-                - Try again in a few moments (Yahoo Finance rate limits)
-                - Check your internet connection
-                - Verify the stock tickers are valid
-                - Try with popular US stocks first
-                """)
+                    # Runs in the background: the page stays usable and other sessions are not blocked
+                    job_id = get_job_runner().submit(
+                        run_custom_strategy, backtest_tickers, config, period_backtest, interval_backtest,
+                        provider, get_backtest_cache(), backtest_key,
+                        label=f"MA{ma_short}/{ma_long} on {len(backtest_tickers)} stocks ({period_backtest}, {interval_backtest})",
+                        key=backtest_key
+                    )
+                    if job_id not in st.session_state.backtest_jobs:
+                        st.session_state.backtest_jobs.append(job_id)
+            st.session_state.backtest_selected = backtest_key
+
+    show_backtest_jobs(st.session_state.backtest_jobs)
+
+    selected_key = st.session_state.get('backtest_selected')
+    cached = get_backtest_cache().get(selected_key) if selected_key is not None else None
+    if cached is not None:
+        backtest_results, backtest_report, failed_tickers = cached
+        shown_ma_short, shown_ma_long = selected_key[1], selected_key[2]
+        show_run_profile(backtest_report)
+        if failed_tickers:
+            st.warning(f"Failed to analyze: {', '.join(failed_tickers)}")
+        
+        if not backtest_results.empty:
+            st.success(f"✅ Backtest completed! Found {len(backtest_results)} trades across {backtest_results['Ticker'].nunique()} stocks")
+            
+            # Display results
+            st.subheader("📊 Backtest Results")
+            
+            # Summary metrics
+            col1, col2, col3, col4 = st.columns(4)
+            
+            stock_performance, overall = stock_stats(backtest_results)
+            total_trades = int(overall['Trades'])
+            avg_profit = overall['AvgProfit']
+            win_rate = overall['WinRate']
+            avg_holding = overall['AvgHoldingDays']
+            
+            with col1:
+                st.metric("Total Trades", total_trades)
+                st.metric("Stocks Analyzed", backtest_results['Ticker'].nunique())
+            
+            with col2:
+                st.metric("Average Profit (%)", f"{avg_profit:.2f}%")
+                st.metric("Win Rate", f"{win_rate:.2f}%")
+            
+            with col3:
+                win_trades = int(overall['WinTrades'])
+                loss_trades = total_trades - win_trades
+                st.metric("Winning Trades", win_trades)
+                st.metric("Losing Trades", loss_trades)
+            
+            with col4:
+                st.metric("Avg Holding Days", f"{avg_holding:.1f}")
+                st.metric("Strategy", f"MA{shown_ma_short}/{shown_ma_long}")
+            
+            # Detailed results table
+            st.subheader("📋 Detailed Trades")
+            st.dataframe(backtest_results)
+            
+            # Performance by stock
+            st.subheader("📈 Performance by Stock")
+            stock_performance = stock_performance[['AvgProfit', 'Trades', 'StdProfit', 'AvgHoldingDays']].join(
+                backtest_results.groupby(backtest_results['Ticker'].astype(str))['BuyPrice'].mean()).round(2)
+            stock_performance.columns = ['Avg Profit (%)', 'Trade Count', 'Std Dev', 'Avg Holding Days', 'Avg Buy Price']
+            st.dataframe(stock_performance)
+            
+            show_performance(backtest_results)
+            show_robustness(backtest_results, "backtest")
+            
+            # Visualizations
+            col_viz1, col_viz2 = st.columns(2)
+            
+            with col_viz1:
+                # Sell reason breakdown
+                st.subheader("📊 Exit Reasons")
+                sell_reasons = backtest_results['SellReason'].value_counts()
+                plt = get_pyplot()
+                fig1, ax1 = plt.subplots()
+                ax1.pie(sell_reasons.values, labels=sell_reasons.index, autopct='%1.1f%%', startangle=90)
+                ax1.set_title("Exit Reasons Distribution")
+                st.pyplot(fig1)
+            
+            with col_viz2:
+                # Profit distribution
+                st.subheader("💰 Profit Distribution")
+                fig2, ax2 = plt.subplots()
+                ax2.hist(backtest_results['ProfitPct'], bins=20, alpha=0.7, color='skyblue')
+                ax2.axvline(0, color='red', linestyle='--', label='Break-even')
+                ax2.set_xlabel('Profit (%)')
+                ax2.set_ylabel('Number of Trades')
+                ax2.legend()
+                st.pyplot(fig2)
+            
+            # Download button for backtest results
+            st.subheader("💾 Export Results")
+            csv_data = backtest_results.to_csv(index=False)
+            st.download_button(
+                "Download Backtest Results as CSV", 
+                csv_data, 
+                f"backtest_results_{shown_ma_short}_{shown_ma_long}.csv", 
+                "text/csv",
+                use_container_width=True
+            )
+            
+        else:
+            st.warning("❌ No trades generated for the selected parameters and stocks.")
+            st.info("""
+            **💡 Suggestions to generate trades:**
+            - Try different moving average periods
+            - Adjust stop-loss and take-profit levels
+            - Select different stocks or more stocks
+            - Extend the analysis period
+            - Use shorter moving averages for more signals
+            """)
+
+    # Questions answered from every stored run, without recomputing
+    with st.expander("🗄️ Stored Results"):
+        store = result_store.get_store()
+        query_col1, query_col2, query_col3 = st.columns(3)
+        with query_col1:
+            query_ticker = st.text_input("Ticker", value=backtest_tickers[0] if backtest_tickers else "", key="store_ticker").strip().upper()
+        with query_col2:
+            query_param = st.selectbox("Parameter", result_store.PARAM_COLUMNS, index=5, key="store_param")
+        with query_col3:
+            query_metric = st.selectbox("Rank by", result_store.METRICS, key="store_metric")
+        best = store.best(query_ticker, query_param, query_metric) if query_ticker else pd.DataFrame()
+        if best.empty:
+            st.write("No stored runs for this ticker yet.")
+        else:
+            st.dataframe(best.round(3))
+        st.caption(f"{len(store.runs())} stored runs; least recently used runs are evicted beyond "
+                   f"{store.max_bytes / 2**20:.0f} MB.")
 
     # Example tickers for user reference
     st.markdown("---")
@@ -579,4 +862,10 @@ elif page == "Backtesting Module":
         st.markdown("- 0005.HK (HSBC)")
         st.markdown("- 0700.HK (Tencent)")
         st.markdown("- 0939.HK (CCB)")
-        st.markdown("- 1299.HK (AIA)")
\ No newline at end of file
+        st.markdown("- 1299.HK (AIA)")
+
+# Poll while this session has jobs in flight; switching pages does not stop them
+session_jobs = st.session_state.get('backtest_jobs', []) + [st.session_state.get('analysis_job')]
+if any(not job.done for job in get_job_runner().list_jobs(session_jobs)):
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
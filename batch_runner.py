@@ -0,0 +1,275 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+from trade_stats import REASON_COLUMNS, STAT_COLUMNS, merge_stats, partial_stats, summarize_stats
+from market_data import FETCH_BURST, FETCH_RATE, FETCH_RETRIES
+from trading_strategy import EXIT_MODES, StrategyConfig, main
+
+# Parquet needs pyarrow; fall back to CSV partitions when it is not installed
+try:
+    import pyarrow  # noqa: F401
+    OUTPUT_FORMAT = "parquet"
+except ImportError:
+    OUTPUT_FORMAT = "csv"
+
+CHECKPOINT_FILE = "checkpoint.json"
+# Runs of a shard before its remaining failed downloads count as permanent (e.g. delisted tickers)
+MAX_ATTEMPTS = 3
+
+# Tickers from a universe file: one per line ("#" comments allowed) or a CSV with a Ticker/Symbol column
+def read_universe(path):
+    if path.endswith(".csv"):
+        frame = pd.read_csv(path)
+        column = next((col for col in frame.columns if col.lower() in ("ticker", "symbol")), frame.columns[0])
+        tickers = frame[column].astype(str)
+    else:
+        with open(path) as f:
+            tickers = [line.split("#")[0] for line in f]
+    tickers = [ticker.strip().upper() for ticker in tickers if ticker.strip()]
+    # Duplicates would be backtested twice and break the input-order guarantees of main()
+    return list(dict.fromkeys(tickers))
+
+def make_shards(tickers, shard_size):
+    return [tickers[start:start + shard_size] for start in range(0, len(tickers), shard_size)]
+
+# Per-ticker partial stats of one shard; tickers without trades get a zero row, and
+# NoData marks the ones whose download failed (they have no trades either)
+def summarize_shard(tickers, positions, failed=()):
+    if not positions.empty:
+        positions = positions.assign(Ticker=positions["Ticker"].astype(str))
+    stats = partial_stats(positions, "Ticker").reindex(pd.Index(tickers, name="Ticker"))
+    counts = [col for col in STAT_COLUMNS if col not in ("MinProfit", "MaxProfit")]
+    stats[counts] = stats[counts].fillna(0)
+    stats[["Trades", "WinTrades"] + REASON_COLUMNS] = stats[["Trades", "WinTrades"] + REASON_COLUMNS].astype(np.int64)
+    stats["NoData"] = stats.index.isin(list(failed))
+    return stats.reset_index()
+
+# Write one partition (TABLE/shard=NNNNN/part.*) atomically, replacing an older attempt
+def write_partition(output_dir, table, shard, frame):
+    directory = os.path.join(output_dir, table, f"shard={shard:05d}")
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    path = os.path.join(tmp, f"part.{OUTPUT_FORMAT}")
+    if OUTPUT_FORMAT == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+
+def read_table(output_dir, table):
+    root = os.path.join(output_dir, table)
+    if not os.path.isdir(root):
+        return pd.DataFrame()
+    frames = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name, f"part.{OUTPUT_FORMAT}")
+        if name.startswith("shard=") and not name.endswith(".tmp") and os.path.exists(path):
+            frame = _read_partition(path)
+            if not frame.empty:
+                frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# One shard's partition of a table (empty if it was never written)
+def read_partition(output_dir, table, shard):
+    path = os.path.join(output_dir, table, f"shard={shard:05d}", f"part.{OUTPUT_FORMAT}")
+    return _read_partition(path) if os.path.exists(path) else pd.DataFrame()
+
+def _read_partition(path):
+    return pd.read_parquet(path) if OUTPUT_FORMAT == "parquet" else _read_csv_partition(path)
+
+def _read_csv_partition(path):
+    try:
+        frame = pd.read_csv(path)
+    except pd.errors.EmptyDataError:
+        # A shard without trades writes a column-less positions frame, i.e. an empty file
+        return pd.DataFrame()
+    for col in ["BuyDate", "SellDate"]:
+        if col in frame.columns:
+            try:
+                frame[col] = pd.to_datetime(frame[col], format="ISO8601")
+            except ValueError:
+                # Mixed UTC offsets (DST, or tickers from several exchanges) only parse as UTC
+                frame[col] = pd.to_datetime(frame[col], format="ISO8601", utc=True)
+    return frame
+
+# Positions of a shard after retrying some of its tickers: their earlier rows are replaced
+# (a retry interrupted after writing is redone without duplicates), and rows are kept in
+# the shard's ticker order, as main() returns them
+def merge_retry(previous, positions, shard_tickers, retried):
+    if not previous.empty:
+        previous = previous[~previous["Ticker"].astype(str).isin(retried)]
+    frames = [frame for frame in (previous, positions) if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    order = pd.Categorical(merged["Ticker"].astype(str), categories=shard_tickers).codes
+    return merged.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+
+# Identity of a batch run; a checkpoint is only resumed for the same universe and parameters
+def run_spec(tickers, config, period, interval, shard_size):
+    return {"universe": hashlib.sha256("\n".join(tickers).encode()).hexdigest(), "tickers": len(tickers),
+            "config": asdict(config), "period": period, "interval": interval, "shard_size": shard_size}
+
+def load_checkpoint(output_dir):
+    try:
+        with open(os.path.join(output_dir, CHECKPOINT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(output_dir, checkpoint):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+# Backtest a ticker universe shard by shard, checkpointing after every shard
+#
+# Each shard goes through main() and is written as positions/ and summary/ partitions
+# before the checkpoint records it, so an interrupted run resumes at the first
+# unfinished shard; a shard that was half-written is simply redone. A shard with failed
+# downloads is written but not marked done: its tickers and attempts are listed under
+# "failed" in the checkpoint, and the next resume only retries those tickers and merges
+# them into the shard's partitions. After max_attempts runs the shard is marked done and
+# its remaining failures stay listed as permanent. Summary partitions hold mergeable
+# per-ticker stats, so totals never need the positions read back.
+def run_batch(tickers, output_dir, config=StrategyConfig(), period="5y", interval="1d", shard_size=100,
+              workers=None, fetch_workers=8, provider=None, restart=False, verbose=False,
+              max_attempts=MAX_ATTEMPTS, rate=FETCH_RATE, burst=FETCH_BURST, retries=FETCH_RETRIES):
+    os.makedirs(output_dir, exist_ok=True)
+    shards = make_shards(tickers, shard_size)
+    spec = run_spec(tickers, config, period, interval, shard_size)
+
+    checkpoint = None if restart else load_checkpoint(output_dir)
+    if checkpoint is not None and checkpoint["spec"] != spec:
+        raise ValueError(f"{output_dir} holds a different run; use another output directory or restart")
+    if checkpoint is None:
+        for table in ("positions", "summary"):
+            shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+        checkpoint = {"spec": spec, "done": [], "failed": {}, "started": time.time()}
+        save_checkpoint(output_dir, checkpoint)
+
+    done = set(checkpoint["done"])
+    if done:
+        print(f"Resuming: {len(done)} of {len(shards)} shards already done")
+    # JSON object keys are strings, so shards are keyed by their number as text
+    pending = [key for key in checkpoint["failed"] if int(key) not in done]
+    if pending:
+        print(f"Retrying failed downloads in {len(pending)} shards")
+    for shard, shard_tickers in enumerate(shards):
+        if shard in done:
+            continue
+        start = time.perf_counter()
+        retry = checkpoint["failed"].get(str(shard))
+        run_tickers = list(retry["errors"]) if retry else shard_tickers
+        # main() reports every ticker; keep the batch log to one line per shard unless asked
+        log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        failed = {}
+        with log:
+            positions = main(run_tickers, provider=provider, max_workers=fetch_workers, processes=workers,
+                             config=config, period=period, interval=interval, failed=failed,
+                             rate=rate, burst=burst, retries=retries)
+        new_trades = len(positions)
+        if retry:
+            positions = merge_retry(read_partition(output_dir, "positions", shard), positions,
+                                    shard_tickers, run_tickers)
+        write_partition(output_dir, "positions", shard, positions)
+        write_partition(output_dir, "summary", shard, summarize_shard(shard_tickers, positions, failed))
+
+        attempts = (retry["attempts"] if retry else 0) + 1
+        if failed:
+            checkpoint["failed"][str(shard)] = {"attempts": attempts, "errors": failed}
+        else:
+            checkpoint["failed"].pop(str(shard), None)
+        if not failed or attempts >= max_attempts:
+            checkpoint["done"].append(shard)
+        save_checkpoint(output_dir, checkpoint)
+        print(f"shard {shard + 1}/{len(shards)}: {len(run_tickers)} tickers, {new_trades} trades "
+              f"in {time.perf_counter() - start:.1f}s"
+              + (f", {len(failed)} downloads failed ({', '.join(failed)})" if failed else ""))
+
+    done = set(checkpoint["done"])
+    pending = [key for key in checkpoint["failed"] if int(key) not in done]
+    if pending:
+        print(f"{len(pending)} shards have failed downloads; run again to retry them")
+    else:
+        permanent = [ticker for entry in checkpoint["failed"].values() for ticker in entry["errors"]]
+        if permanent:
+            print(f"{len(permanent)} tickers failed on every attempt: {', '.join(permanent)}")
+        checkpoint["finished"] = time.time()
+    save_checkpoint(output_dir, checkpoint)
+    return read_stats(output_dir)
+
+# Per-ticker stats of a finished (or partial) batch, with win rates and averages
+def read_stats(output_dir):
+    partials = read_table(output_dir, "summary")
+    if partials.empty:
+        return partials
+    return summarize_stats(partials.set_index("Ticker")).reset_index()
+
+# Moving-average windows are bar counts, or time windows such as "4h" for intraday data
+def window(value):
+    return int(value) if value.isdigit() else value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the golden-cross strategy over a ticker universe")
+    parser.add_argument("universe", help="file with one ticker per line, or a CSV with a Ticker column")
+    parser.add_argument("--output", default="batch_output", help="directory for partitions and the checkpoint")
+    parser.add_argument("--ma-short", type=window, default=50)
+    parser.add_argument("--ma-long", type=window, default=200)
+    parser.add_argument("--holding-period", type=int, default=60)
+    parser.add_argument("--holding-unit", choices=["days", "bars"], default="days")
+    parser.add_argument("--stop-loss", type=float, default=10.0, help="stop-loss in percent")
+    parser.add_argument("--take-profit", type=float, default=15.0, help="take-profit in percent")
+    parser.add_argument("--exit-mode", choices=list(EXIT_MODES), default="close",
+                        help="trigger exits on closes, or on bar highs/lows with gap-aware fills")
+    parser.add_argument("--trailing-stop", type=float, default=0.0, help="trailing stop in percent (0 = off)")
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--shard-size", type=int, default=100, help="tickers per shard (and per checkpoint)")
+    parser.add_argument("--workers", type=int, default=None, help="backtest processes per shard")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--rate", type=float, default=FETCH_RATE,
+                        help="download requests per second, to match the data source's quota")
+    parser.add_argument("--burst", type=int, default=FETCH_BURST, help="requests allowed in one burst")
+    parser.add_argument("--retries", type=int, default=FETCH_RETRIES,
+                        help="retries of a download after a network error")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help="runs of a shard before its failed downloads are given up on")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start over")
+    parser.add_argument("--verbose", action="store_true", help="show main()'s per-ticker output")
+    return parser.parse_args(argv)
+
+# Only run this if the script is executed directly
+if __name__ == "__main__":
+    args = parse_args()
+    tickers = read_universe(args.universe)
+    config = StrategyConfig(args.ma_short, args.ma_long, args.holding_period, args.stop_loss,
+                            args.take_profit, args.holding_unit, args.exit_mode, args.trailing_stop)
+    print(f"Backtesting {len(tickers)} tickers in shards of {args.shard_size} ({OUTPUT_FORMAT} output)")
+    summary = run_batch(tickers, args.output, config, args.period, args.interval, args.shard_size,
+                        args.workers, args.fetch_workers, restart=args.restart, verbose=args.verbose,
+                        max_attempts=args.max_attempts, rate=args.rate, burst=args.burst,
+                        retries=args.retries)
+
+    total = summarize_stats(merge_stats(summary.set_index("Ticker")[STAT_COLUMNS], by=[])).iloc[0]
+    total_trades = int(total["Trades"])
+    print(f"\n=== Batch Summary ===")
+    print(f"Tickers: {len(summary)}, without data: {int(summary['NoData'].sum())}, "
+          f"with trades: {int((summary['Trades'] > 0).sum()) if total_trades else 0}")
+    print(f"Total trades: {total_trades}")
+    if total_trades:
+        print(f"Win rate: {total['WinRate']:.2f}%")
+        print(f"Average profit: {total['AvgProfit']:.2f}% (std {total['StdProfit']:.2f}%)")
@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import market_data
+from trading_strategy import (get_stock_data, calculate_moving_averages, identify_golden_cross,
+                              implement_strategy, main, run_backtest, StrategyConfig, DEFAULT_CONFIG)
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Modules whose cold import time is tracked, and the heavy dependencies they should not pull in
+STARTUP_MODULES = ["market_data", "trading_strategy", "app"]
+HEAVY_MODULES = ["matplotlib", "yfinance"]
+
+# Geometric Brownian motion closes with Open/High/Low bands around them
+def synthetic_ohlcv(n_bars, seed=0, start="1990-01-02", price=100.0, mu=0.07, sigma=0.25):
+    rng = np.random.default_rng(seed)
+    dt = 1 / TRADING_DAYS_PER_YEAR
+    log_returns = rng.normal((mu - sigma ** 2 / 2) * dt, sigma * np.sqrt(dt), n_bars)
+    close = price * np.exp(np.cumsum(log_returns))
+
+    # Open gaps from the previous close; High/Low extend beyond both Open and Close
+    prev_close = np.concatenate([[price], close[:-1]])
+    open_ = prev_close * np.exp(rng.normal(0, sigma * np.sqrt(dt) / 4, n_bars))
+    spread = np.abs(rng.normal(0, sigma * np.sqrt(dt) / 2, n_bars))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(14, 0.5, n_bars).astype(np.int64)
+
+    # Weekday calendar built with a mask; bdate_range generates dates one by one
+    days = pd.date_range(start, periods=n_bars * 7 // 5 + 7, freq="D", name="Date")
+    index = days[days.dayofweek < 5][:n_bars]
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=index)
+
+# Offline provider that generates a deterministic series per ticker
+class SyntheticProvider(market_data.DataProvider):
+    def __init__(self, years=5):
+        self.n_bars = int(years * TRADING_DAYS_PER_YEAR)
+
+    def get_history(self, ticker, period="5y", interval="1d"):
+        return synthetic_ohlcv(self.n_bars, seed=zlib.crc32(ticker.encode()))
+
+# Run fn, returning its result, wall time and peak traced memory
+def measure(fn, *args, trace_memory=True, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        # tracemalloc slows allocation-heavy code a lot, so memory is traced in a second run
+        peak = 0
+        if trace_memory:
+            tracemalloc.start()
+            fn(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return result, seconds, peak
+
+# Time every pipeline stage for one (tickers, years) scale
+def run_scale(n_tickers, years, processes=None, trace_memory=True):
+    provider = SyntheticProvider(years)
+    tickers = [f"SYN{i:05d}" for i in range(n_tickers)]
+    stages = {"get_stock_data": [0.0, 0], "calculate_moving_averages": [0.0, 0],
+              "identify_golden_cross": [0.0, 0], "implement_strategy": [0.0, 0]}
+
+    def record(stage, seconds, peak):
+        stages[stage][0] += seconds
+        stages[stage][1] = max(stages[stage][1], peak)
+
+    trades = 0
+    for ticker in tickers:
+        data, seconds, peak = measure(get_stock_data, ticker, provider=provider, trace_memory=trace_memory)
+        record("get_stock_data", seconds, peak)
+        data, seconds, peak = measure(calculate_moving_averages, data, trace_memory=trace_memory)
+        record("calculate_moving_averages", seconds, peak)
+        data, seconds, peak = measure(identify_golden_cross, data, trace_memory=trace_memory)
+        record("identify_golden_cross", seconds, peak)
+        positions, seconds, peak = measure(implement_strategy, data, trace_memory=trace_memory)
+        record("implement_strategy", seconds, peak)
+        trades += len(positions)
+
+    positions, seconds, peak = measure(main, tickers, provider=provider, processes=processes,
+                                       trace_memory=trace_memory)
+    stages["main"] = [seconds, peak]
+
+    return [{"stage": stage, "tickers": n_tickers, "years": years, "bars": provider.n_bars,
+             "trades": trades, "seconds": round(seconds, 6), "peak_bytes": peak}
+            for stage, (seconds, peak) in stages.items()]
+
+# Cold import time of a module in a fresh interpreter (median of `repeat` runs)
+def measure_startup(module, repeat=5):
+    code = ("import sys, time, json; start = time.perf_counter(); import {module}; "
+            "print(json.dumps([time.perf_counter() - start, [m for m in {heavy} if m in sys.modules]]))"
+            ).format(module=module, heavy=HEAVY_MODULES)
+    # Streamlit only runs app.py in "bare" mode outside `streamlit run`, which still imports everything
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(repeat):
+        run = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        if run.returncode != 0:
+            return None
+        seconds, heavy = json.loads(run.stdout.strip().splitlines()[-1])
+        timings.append(seconds)
+    return {"stage": f"import {module}", "tickers": 0, "years": 0, "bars": 0, "trades": 0,
+            "seconds": round(float(np.median(timings)), 6), "peak_bytes": 0, "heavy_imports": heavy}
+
+# Configs checked against the reference loop. Tight symmetric stops over a long window
+# often reach the target before the stop, which the stop-loss-first rule must override;
+# a trailing stop too wide to ever trigger must leave those exits unchanged
+CHECK_CONFIGS = [DEFAULT_CONFIG, StrategyConfig(20, 50, 90, 5.0, 5.0),
+                 StrategyConfig(20, 50, 90, 5.0, 5.0, trailing_stop_pct=99.0)]
+
+# The original per-signal loop: a stop-loss anywhere in the window (closes up to
+# holding_period calendar days after the entry) wins, then the take-profit, else the
+# last bar of the window
+def reference_backtest(data, config=DEFAULT_CONFIG):
+    data = calculate_moving_averages(data.copy(), config.ma_short, config.ma_long)
+    data = identify_golden_cross(data, config.ma_short, config.ma_long).iloc[config.ma_long:]
+    positions = []
+    for buy_date in data.index[data['GoldenCross']]:
+        buy_price = data.loc[buy_date, 'Close']
+        window = data.loc[buy_date:buy_date + pd.Timedelta(days=config.holding_period), 'Close']
+        stop_loss_hit = window[window <= buy_price * config.stop_loss]
+        target_reached = window[window >= buy_price * config.take_profit]
+        if not stop_loss_hit.empty:
+            sell_date, sell_reason = stop_loss_hit.index[0], "Stop-loss hit"
+        elif not target_reached.empty:
+            sell_date, sell_reason = target_reached.index[0], "Target reached"
+        else:
+            sell_date, sell_reason = window.index[-1], "Max holding period"
+        positions.append({'BuyDate': buy_date, 'SellDate': sell_date,
+                          'SellPrice': data.loc[sell_date, 'Close'], 'SellReason': sell_reason})
+    return pd.DataFrame(positions, columns=['BuyDate', 'SellDate', 'SellPrice', 'SellReason'])
+
+# Tickers whose run_backtest trades differ from the reference loop, per config
+def check_backtest(n_tickers=20, years=20, configs=CHECK_CONFIGS):
+    provider = SyntheticProvider(years)
+    mismatches = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, config in enumerate(configs):
+            for ticker in [f"SYN{n:05d}" for n in range(n_tickers)]:
+                data = provider.get_history(ticker)
+                expected = reference_backtest(data, config)
+                positions = run_backtest(data, config)
+                actual = positions[expected.columns] if not positions.empty else expected.iloc[:0]
+                if not actual.reset_index(drop=True).equals(expected):
+                    mismatches.append((i, ticker, len(actual), len(expected)))
+    return mismatches
+
+# Stages that got slower than the baseline by more than the tolerance
+def find_regressions(results, baseline, tolerance=0.2):
+    key = lambda r: (r["stage"], r["tickers"], r["years"])
+    reference = {key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = reference.get(key(result))
+        if old is not None and result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append({**result, "baseline_seconds": old["seconds"]})
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the golden-cross pipeline on synthetic data")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 10, 100],
+                        help="universe sizes to run (up to 10000)")
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5, 20],
+                        help="history lengths in years of daily bars (up to 50)")
+    parser.add_argument("--processes", type=int, default=None, help="process pool size for main()")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--startup", action="store_true",
+                        help="also measure cold import time of the CLI and dashboard modules")
+    parser.add_argument("--check", action="store_true",
+                        help="only compare run_backtest with the reference loop, then exit")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown vs the baseline before failing (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+# Only run this if the script is executed directly
+if __name__ == "__main__":
+    args = parse_args()
+    if args.check:
+        mismatches = check_backtest()
+        for i, ticker, n_actual, n_expected in mismatches:
+            print(f"MISMATCH config {i} ({CHECK_CONFIGS[i]}) {ticker}: {n_actual} trades vs {n_expected} expected")
+        print(f"Checked {len(CHECK_CONFIGS)} configs: {'FAILED' if mismatches else 'OK'}")
+        sys.exit(1 if mismatches else 0)
+    results = []
+    if args.startup:
+        for module in STARTUP_MODULES:
+            row = measure_startup(module)
+            if row is None:
+                print(f"import {module:<20} failed (missing dependency?)")
+                continue
+            print(f"{row['stage']:<26} {row['seconds']:>10.4f}s  heavy={','.join(row['heavy_imports']) or '-'}")
+            results.append(row)
+    for n_tickers in args.tickers:
+        for years in args.years:
+            for row in run_scale(n_tickers, years, args.processes, not args.no_memory):
+                print(f"{row['stage']:<26} tickers={n_tickers:<6} years={years:<5} "
+                      f"{row['seconds']:>10.4f}s  peak={row['peak_bytes'] / 2**20:8.1f} MiB")
+                results.append(row)
+
+    report = {"python": platform.python_version(), "pandas": pd.__version__,
+              "numpy": np.__version__, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)["results"], args.tolerance)
+        for row in regressions:
+            print(f"REGRESSION {row['stage']} tickers={row['tickers']} years={row['years']}: "
+                  f"{row['seconds']:.4f}s vs {row['baseline_seconds']:.4f}s")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,45 @@
+import numpy as np
+
+# Screen-resolution target for line charts (roughly one point per horizontal pixel)
+DEFAULT_POINTS = 2000
+
+# Largest-Triangle-Three-Buckets: indices of n_out points that preserve the series' shape
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # NaNs (e.g. the MA warm-up) cannot win a triangle comparison
+    y = np.where(np.isnan(y), np.nanmean(y), y)
+    prev = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        area = np.abs((x[prev] - avg_x) * (y[start:stop] - y[prev])
+                      - (x[prev] - x[start:stop]) * (avg_y - y[prev]))
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+    return selected
+
+# Row positions to plot: LTTB on Close plus every bar that carries a buy or sell marker
+def downsample_chart(data, n_out=DEFAULT_POINTS, keep=()):
+    x = np.arange(len(data), dtype=np.float64)
+    indices = lttb_indices(x, data['Close'].to_numpy(dtype=np.float64), n_out)
+    keep = np.asarray(keep, dtype=np.int64)
+    return np.union1d(indices, keep[(keep >= 0) & (keep < len(data))])
+
+# Downsampled copy of the chart frame that keeps all marker dates
+def downsample_frame(data, marker_dates=(), n_out=DEFAULT_POINTS):
+    keep = data.index.get_indexer(list(marker_dates))
+    if 'GoldenCross' in data.columns:
+        keep = np.concatenate([keep, np.flatnonzero(data['GoldenCross'].to_numpy(dtype=bool))])
+    return data.iloc[downsample_chart(data, n_out, keep)]
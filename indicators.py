@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# Rolling mean of Close over a bar count or a time window ("4h", "3D"); NaN until the window is full
+def moving_average(close, window):
+    if isinstance(window, str):
+        ma = close.rolling(window).mean().to_numpy(copy=True)
+        ma[:warmup_bars(close.index, window) - 1] = np.nan
+        return ma
+    return close.rolling(window=window).mean().to_numpy()
+
+# Leading bars without a complete window plus one (so ma_long bars for a bar-count window)
+def warmup_bars(index, window):
+    if isinstance(window, str):
+        dates = pd.DatetimeIndex(index).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return int(np.searchsorted(dates, dates[0] + pd.Timedelta(window).value)) + 1
+    return window
+
+# Node functions of the indicator graph, by name; each is called as fn(graph, *params)
+# and pulls its inputs through graph.get(), which memoizes them and records the edges
+NODES = {}
+
+def node(name):
+    def register(fn):
+        NODES[name] = fn
+        return fn
+    return register
+
+# Inputs are given as node keys; a bare column name stands for that price column
+def _key(source):
+    return ("price", source) if isinstance(source, str) else tuple(source)
+
+@node("price")
+def _price(graph, column):
+    return graph.data[column].to_numpy(dtype=np.float64)
+
+@node("delta")
+def _delta(graph, source):
+    values = graph.get(*_key(source))
+    delta = np.full(len(values), np.nan)
+    delta[1:] = values[1:] - values[:-1]
+    return delta
+
+@node("gain")
+def _gain(graph, source):
+    return np.clip(graph.get("delta", source), 0.0, None)
+
+@node("loss")
+def _loss(graph, source):
+    return np.clip(-graph.get("delta", source), 0.0, None)
+
+@node("sma")
+def _sma(graph, window, source):
+    return moving_average(graph.series(source), window)
+
+@node("std")
+def _std(graph, window, source):
+    std = graph.series(source).rolling(window).std(ddof=0).to_numpy(copy=True)
+    std[:warmup_bars(graph.data.index, window) - 1] = np.nan
+    return std
+
+# Exponential average seeded at the first value, NaN for the first span inputs
+@node("ema")
+def _ema(graph, span, source):
+    return graph.series(source).ewm(span=span, adjust=False, min_periods=span).mean().to_numpy()
+
+# Wilder's smoothing (alpha = 1 / window), as used by RSI and ATR
+@node("rma")
+def _rma(graph, window, source):
+    return graph.series(source).ewm(alpha=1 / window, adjust=False, min_periods=window).mean().to_numpy()
+
+@node("true_range")
+def _true_range(graph):
+    high, low, close = graph.get("price", "High"), graph.get("price", "Low"), graph.get("price", "Close")
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    # The first bar has no previous close, so its range is just High - Low
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+@node("atr")
+def _atr(graph, window):
+    return graph.get("rma", window, ("true_range",))
+
+@node("rsi")
+def _rsi(graph, window, source):
+    gain = graph.get("rma", window, ("gain", source))
+    loss = graph.get("rma", window, ("loss", source))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + gain / loss)
+    # No losses in the window: RSI is 100 (or undefined when the price did not move at all)
+    return np.where(loss == 0, np.where(gain > 0, 100.0, np.nan), rsi)
+
+@node("macd")
+def _macd(graph, fast, slow, source):
+    return graph.get("ema", fast, source) - graph.get("ema", slow, source)
+
+@node("macd_signal")
+def _macd_signal(graph, fast, slow, signal, source):
+    return graph.get("ema", signal, ("macd", fast, slow, source))
+
+@node("macd_hist")
+def _macd_hist(graph, fast, slow, signal, source):
+    return graph.get("macd", fast, slow, source) - graph.get("macd_signal", fast, slow, signal, source)
+
+@node("bb_upper")
+def _bb_upper(graph, window, width, source):
+    return graph.get("sma", window, source) + width * graph.get("std", window, source)
+
+@node("bb_lower")
+def _bb_lower(graph, window, width, source):
+    return graph.get("sma", window, source) - width * graph.get("std", window, source)
+
+# Memoized indicator graph over one ticker's OHLC frame
+#
+# Every indicator is a node keyed by (name, *params). A node is computed on first use,
+# pulling its inputs through get(), so shared intermediates (rolling means, EMAs, true
+# range, Wilder averages) are computed once per frame however many indicators or entry
+# rules use them. The edges seen so far are kept in deps, e.g. for inspecting a rule.
+class IndicatorGraph:
+    def __init__(self, data):
+        self.data = data
+        self.values = {}
+        self.deps = {}
+        self._stack = []
+
+    def get(self, name, *params):
+        key = (name, *params)
+        if self._stack:
+            self.deps.setdefault(self._stack[-1], set()).add(key)
+        if key not in self.values:
+            if name not in NODES:
+                raise ValueError(f"Unknown indicator: {name}")
+            self._stack.append(key)
+            try:
+                self.values[key] = NODES[name](self, *params)
+            finally:
+                self._stack.pop()
+        return self.values[key]
+
+    # A node's values as a Series on the frame's index (rolling windows need the dates)
+    def series(self, source):
+        return pd.Series(self.get(*_key(source)), index=self.data.index)
+
+    # Every node the given one depends on, directly or not
+    def dependencies(self, name, *params):
+        seen = set()
+        pending = [(name, *params)]
+        while pending:
+            for dep in self.deps.get(pending.pop(), ()):
+                if dep not in seen:
+                    seen.add(dep)
+                    pending.append(dep)
+        return seen
+
+    def sma(self, window, source="Close"):
+        return self.get("sma", window, _key(source))
+
+    def ema(self, span, source="Close"):
+        return self.get("ema", span, _key(source))
+
+    def rsi(self, window=14, source="Close"):
+        return self.get("rsi", window, _key(source))
+
+    # MACD line, signal line and histogram
+    def macd(self, fast=12, slow=26, signal=9, source="Close"):
+        source = _key(source)
+        return (self.get("macd", fast, slow, source), self.get("macd_signal", fast, slow, signal, source),
+                self.get("macd_hist", fast, slow, signal, source))
+
+    def atr(self, window=14):
+        return self.get("atr", window)
+
+    # Middle, upper and lower band
+    def bollinger(self, window=20, width=2.0, source="Close"):
+        source = _key(source)
+        return (self.get("sma", window, source), self.get("bb_upper", window, width, source),
+                self.get("bb_lower", window, width, source))
+
+# Entry-rule building blocks: boolean arrays that combine with & | ~
+
+# Bars where a crosses above b (b may be a constant level, e.g. 30 for RSI)
+def cross_above(a, b):
+    a, b = np.broadcast_arrays(a, b)
+    cross = np.zeros(len(a), dtype=bool)
+    cross[1:] = (a[1:] > b[1:]) & (a[:-1] <= b[:-1])
+    return cross
+
+def cross_below(a, b):
+    a, b = np.broadcast_arrays(a, b)
+    cross = np.zeros(len(a), dtype=bool)
+    cross[1:] = (a[1:] < b[1:]) & (a[:-1] >= b[:-1])
+    return cross
+
+# Bar positions where a rule fires, skipping the warm-up rows
+def rule_entries(signal, warmup=0):
+    signal = np.asarray(signal, dtype=bool).copy()
+    signal[:warmup] = False
+    return np.flatnonzero(signal)
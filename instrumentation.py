@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+logger = logging.getLogger("trading_strategy.profile")
+
+# Per-stage, per-ticker wall time, row counts and (optionally) allocations for one run
+class RunProfile:
+    def __init__(self, track_allocations=False, log=False):
+        self.records = []
+        self.log = log
+        self.lock = threading.Lock()
+        # Allocation deltas come from tracemalloc, which also slows the run down noticeably
+        self.track_allocations = track_allocations
+        self._started_tracing = track_allocations and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    def finish(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # Time a block; the yielded record can be updated, e.g. record["rows"] = len(data)
+    @contextmanager
+    def stage(self, name, ticker=None, rows=None):
+        record = {"stage": name, "ticker": ticker, "rows": rows}
+        alloc_start = tracemalloc.get_traced_memory()[0] if self.track_allocations else None
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            # Net traced memory change; concurrent stages on other threads are included
+            record["alloc_bytes"] = (tracemalloc.get_traced_memory()[0] - alloc_start
+                                     if self.track_allocations else None)
+            self.add(record)
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+        if self.log:
+            logger.info("%s ticker=%s rows=%s %.4fs", record["stage"], record["ticker"],
+                        record["rows"], record["seconds"])
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    # One row per recorded stage call
+    def report(self):
+        columns = ["stage", "ticker", "rows", "seconds", "alloc_bytes"]
+        with self.lock:
+            return pd.DataFrame(self.records, columns=columns)
+
+    def summary(self, by="stage"):
+        return summarize_report(self.report(), by)
+
+# Totals per stage (or per ticker) of a profile report, slowest first
+def summarize_report(report, by="stage"):
+    if report.empty:
+        return report
+    summary = report.groupby(by).agg(calls=("seconds", "size"), seconds=("seconds", "sum"),
+                                     rows=("rows", "sum"), alloc_bytes=("alloc_bytes", "sum"))
+    summary["share_pct"] = summary["seconds"] / summary["seconds"].sum() * 100
+    return summary.sort_values("seconds", ascending=False)
+
+# Stand-in used when no profile is requested, so call sites need no branching
+class NullProfile:
+    def stage(self, name, ticker=None, rows=None):
+        return nullcontext({})
+
+    def extend(self, records):
+        pass
+
+NULL_PROFILE = NullProfile()
@@ -0,0 +1,126 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Raised inside a job function by Job.report() once the job has been cancelled
+class JobCancelled(Exception):
+    pass
+
+# State of one submitted job; the worker updates it, any thread may read it
+class Job:
+    def __init__(self, job_id, label="", key=None):
+        self.id = job_id
+        self.label = label
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    # Publish progress in [0, 1]; also the point where a cancelled job stops
+    def report(self, progress, message=""):
+        self.progress = progress
+        self.message = message
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+# Local worker pool that runs functions in the background under job IDs
+#
+# Job functions are called as fn(job, *args, **kwargs) and should call job.report()
+# between units of work, so progress is visible and cancellation takes effect.
+# Jobs submitted with the same key while one is still queued or running share it.
+# Only the newest max_finished finished jobs are kept.
+class JobRunner:
+    def __init__(self, max_workers=4, max_finished=50):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, label="", key=None, **kwargs):
+        with self.lock:
+            if key is not None:
+                for job in self.jobs.values():
+                    if job.key == key and not job.done and not job.cancel_requested:
+                        return job.id
+            job = Job(uuid.uuid4().hex[:12], label, key)
+            self.jobs[job.id] = job
+        job.future = self.pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, FAILED)
+        else:
+            job.progress = 1.0
+            self._finish(job, DONE)
+
+    def _finish(self, job, status):
+        job.finished = time.time()
+        job.status = status
+        with self.lock:
+            finished = [job_id for job_id, other in self.jobs.items() if other.done]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    # Queued jobs are dropped right away, running ones stop at their next report()
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def list_jobs(self, job_ids=None):
+        with self.lock:
+            if job_ids is None:
+                return list(self.jobs.values())
+            return [self.jobs[job_id] for job_id in job_ids if job_id in self.jobs]
+
+    def active(self):
+        return [job for job in self.list_jobs() if not job.done]
+
+    def shutdown(self, wait=True):
+        for job in self.active():
+            self.cancel(job.id)
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,537 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import NULL_PROFILE
+
+# Parquet needs pyarrow; fall back to pickle files when it is not installed
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+# Bar sizes accepted by Yahoo Finance; intraday history is limited upstream (1m: ~30 days)
+INTERVALS = ["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo"]
+
+# First timestamp covered by a yfinance-style period string (None for "max")
+def period_start(period, now=None):
+    now = pd.Timestamp.now().normalize() if now is None else now
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period}")
+    return now - pd.DateOffset(**{PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+# Storage key of one ticker's series at one bar size (daily series keep the bare ticker)
+def series_key(ticker, interval="1d"):
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return ticker if interval == "1d" else f"{ticker}_{interval}"
+
+# Download history from Yahoo Finance, either by period or from a start date
+def fetch_history(ticker, period="5y", start=None, interval="1d"):
+    # Imported on first download: yfinance is slow to import and cached or local data never needs it
+    import yfinance as yf
+    stock = yf.Ticker(ticker)
+    if start is not None:
+        return stock.history(start=start, interval=interval)
+    return stock.history(period=period, interval=interval)
+
+# Write a file through a temporary file and an atomic rename, so readers in other threads
+# (sessions, background jobs) never see it half-written; the temporary name is private
+# to the writing thread, so concurrent writers of one file do not clobber each other
+def _write_atomic(path, write):
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _write_json(path, value):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(value, f)
+    _write_atomic(path, write)
+
+# On-disk OHLCV cache keyed by ticker with incremental refresh
+class OHLCVCache:
+    def __init__(self, cache_dir=".ohlcv_cache", ttl=6 * 3600, max_bytes=None, offline=False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+    def _data_path(self, ticker):
+        return os.path.join(self.cache_dir, f"{ticker}.{CACHE_FORMAT}")
+
+    def _meta_path(self, ticker):
+        return os.path.join(self.cache_dir, f"{ticker}.json")
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._meta_path(ticker)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_data(self, ticker):
+        path = self._data_path(ticker)
+        data = pd.read_parquet(path) if CACHE_FORMAT == "parquet" else pd.read_pickle(path)
+        # Record the access for LRU eviction without touching the modification time
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+        return data
+
+    def _write(self, ticker, data, covers_from):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_atomic(self._data_path(ticker), data.to_parquet if CACHE_FORMAT == "parquet" else data.to_pickle)
+        meta = {
+            "fetched_at": time.time(),
+            "covers_from": None if covers_from is None else str(covers_from),
+        }
+        _write_json(self._meta_path(ticker), meta)
+        if self.max_bytes is not None:
+            self.evict(max_bytes=self.max_bytes)
+
+    # True if the stored history reaches back to start (None means "max")
+    def _covers(self, meta, start):
+        if meta is None:
+            return False
+        if meta["covers_from"] is None:
+            return True
+        return start is not None and pd.Timestamp(meta["covers_from"]) <= start
+
+    def is_fresh(self, ticker, period="5y", interval="1d"):
+        key = series_key(ticker, interval)
+        meta = self._read_meta(key)
+        return (self._covers(meta, period_start(period))
+                and time.time() - meta["fetched_at"] < self.ttl
+                and os.path.exists(self._data_path(key)))
+
+    def get(self, ticker, period="5y", interval="1d"):
+        start = period_start(period)
+        key = series_key(ticker, interval)
+        meta = self._read_meta(key)
+        have_data = meta is not None and os.path.exists(self._data_path(key))
+        data = self._read_data(key) if have_data else None
+
+        if not self.offline:
+            if data is None or not self._covers(meta, start):
+                # Nothing usable stored for this range: fetch the full period
+                data = fetch_history(ticker, period, interval=interval)
+                if data.empty:
+                    return data
+                self._write(key, data, start)
+            elif time.time() - meta["fetched_at"] >= self.ttl:
+                # Stale: fetch only the bars since the last stored date
+                new_bars = fetch_history(ticker, start=data.index[-1].date(), interval=interval)
+                if not new_bars.empty:
+                    data = pd.concat([data, new_bars])
+                    data = data[~data.index.duplicated(keep="last")].sort_index()
+                self._write(key, data, meta["covers_from"])
+
+        if data is None:
+            return None
+        if start is not None:
+            data = data[data.index >= _align_tz(start, data.index)]
+        return data
+
+    # Mark entries as stale so the next get fetches the newest bars
+    def expire(self, tickers=None):
+        if not os.path.isdir(self.cache_dir):
+            return
+        if tickers is None:
+            tickers = [os.path.splitext(name)[0] for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        for ticker in tickers:
+            meta = self._read_meta(ticker)
+            if meta is not None:
+                meta["fetched_at"] = 0
+                _write_json(self._meta_path(ticker), meta)
+
+    def clear(self, ticker=None):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if ticker is None or os.path.splitext(name)[0] == ticker:
+                os.remove(os.path.join(self.cache_dir, name))
+
+    # Drop entries older than max_age seconds, then least recently used until under max_bytes
+    def evict(self, max_bytes=None, max_age=None):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            ticker, ext = os.path.splitext(name)
+            if ext != f".{CACHE_FORMAT}":
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            meta = self._read_meta(ticker)
+            if max_age is not None and (meta is None or time.time() - meta["fetched_at"] > max_age):
+                self.clear(ticker)
+                continue
+            entries.append((stat.st_atime, stat.st_size, ticker))
+
+        if max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, ticker in sorted(entries):
+                if total <= max_bytes:
+                    break
+                self.clear(ticker)
+                total -= size
+
+# Localize a naive timestamp to the timezone of a price index
+def _align_tz(timestamp, index):
+    if getattr(index, "tz", None) is not None and timestamp.tzinfo is None:
+        return timestamp.tz_localize(index.tz)
+    return timestamp
+
+# Shared cache used by the Yahoo Finance provider, configured from the environment
+default_cache = OHLCVCache(
+    cache_dir=os.environ.get("OHLCV_CACHE_DIR", ".ohlcv_cache"),
+    offline=os.environ.get("OHLCV_OFFLINE", "") == "1",
+)
+
+def set_default_cache(cache):
+    global default_cache
+    default_cache = cache
+
+# Base class for market-data sources used by get_stock_data
+class DataProvider:
+    def get_history(self, ticker, period="5y", interval="1d"):
+        raise NotImplementedError
+
+    # True if the request can be answered without a network round trip
+    def is_local(self, ticker, period="5y", interval="1d"):
+        return True
+
+    # Label of the source and of the state of its data, which changes whenever the data
+    # behind a request may have changed; by default the current bar of the interval
+    def data_version(self, tickers, period="5y", interval="1d"):
+        bar = pd.Timestamp.now(tz="UTC").floor(_bar_freq(interval))
+        return f"{type(self).__name__}@{bar.isoformat()}"
+
+# pandas frequency of one bar (the day for daily and longer bars)
+def _bar_freq(interval):
+    if interval.endswith("m") and not interval.endswith("mo"):
+        return interval[:-1] + "min"
+    if interval.endswith("h"):
+        return interval
+    return "D"
+
+# Yahoo Finance, read through the on-disk OHLCV cache
+class YFinanceProvider(DataProvider):
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def _cache(self):
+        return default_cache if self.cache is None else self.cache
+
+    def get_history(self, ticker, period="5y", interval="1d"):
+        return self._cache().get(ticker, period, interval)
+
+    def is_local(self, ticker, period="5y", interval="1d"):
+        return self._cache().is_fresh(ticker, period, interval)
+
+    # Each write to the cache stamps fetched_at, so the fetch times identify the stored
+    # data (a refresh expires them). A series that is missing or due for a refresh gets
+    # a one-off version, since reading it downloads new bars.
+    def data_version(self, tickers, period="5y", interval="1d"):
+        cache = self._cache()
+        signature = [type(self).__name__, os.path.abspath(cache.cache_dir)]
+        for ticker in tickers:
+            meta = cache._read_meta(series_key(ticker, interval))
+            if meta is None or not (cache.offline or cache.is_fresh(ticker, period, interval)):
+                return f"{type(self).__name__}@pending:{time.time_ns()}"
+            signature.append([meta["fetched_at"], meta["covers_from"]])
+        return _digest(signature)
+
+# Directory of per-ticker OHLCV files (TICKER.parquet, TICKER.feather or TICKER.csv;
+# intraday series are stored as TICKER_5m.parquet etc.)
+class LocalFileProvider(DataProvider):
+    EXTENSIONS = (".parquet", ".feather", ".csv")
+
+    def __init__(self, directory, memory_map=True):
+        self.directory = directory
+        self.memory_map = memory_map
+
+    def _find(self, ticker):
+        for ext in self.EXTENSIONS:
+            path = os.path.join(self.directory, ticker + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _read(self, path):
+        if path.endswith(".parquet"):
+            data = pd.read_parquet(path, memory_map=self.memory_map)
+        elif path.endswith(".feather"):
+            # pd.read_feather has no memory_map argument, so go through pyarrow directly
+            from pyarrow import feather
+            data = feather.read_table(path, memory_map=self.memory_map).to_pandas()
+        else:
+            data = pd.read_csv(path, index_col=0, memory_map=self.memory_map)
+
+        # Feather files cannot store an index, so the dates come back as a column
+        if not isinstance(data.index, pd.DatetimeIndex):
+            if "Date" in data.columns:
+                data = data.set_index("Date")
+            data.index = pd.to_datetime(data.index, utc=_has_utc_offset(data.index))
+        data.columns = [col.title() for col in data.columns]
+        return data.sort_index()
+
+    def tickers(self):
+        names = (os.path.splitext(name) for name in os.listdir(self.directory))
+        return sorted({ticker for ticker, ext in names
+                       if ext in self.EXTENSIONS and not _is_intraday_key(ticker)})
+
+    def get_history(self, ticker, period="5y", interval="1d"):
+        path = self._find(series_key(ticker, interval))
+        if path is None:
+            return None
+        return _last_period(self._read(path), period)
+
+    # Files only change when rewritten, so their size and mtime identify the data
+    def data_version(self, tickers, period="5y", interval="1d"):
+        signature = [os.path.abspath(self.directory)]
+        for ticker in tickers:
+            path = self._find(series_key(ticker, interval))
+            stat = os.stat(path) if path is not None else None
+            signature.append(None if stat is None else [stat.st_size, stat.st_mtime_ns])
+        return _digest(signature)
+
+# Periods of stored data are measured back from the last stored bar, not from today
+def _last_period(data, period):
+    if period == "max" or data.empty:
+        return data
+    last = data.index[-1]
+    start = period_start(period, now=last.tz_localize(None).normalize() if last.tzinfo else last.normalize())
+    return data[data.index >= _align_tz(start, data.index)]
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value).encode()).hexdigest()[:16]
+
+def _is_intraday_key(key):
+    ticker, _, suffix = key.rpartition("_")
+    return bool(ticker) and suffix in INTERVALS
+
+# Append-only, memory-mapped bar storage: one raw column file per field
+#
+# Each series (ticker + interval) lives in DIRECTORY/KEY/ as Timestamp.bin (int64 UTC
+# nanoseconds) and Open/High/Low/Close/Volume.bin (float64), with meta.json holding the
+# committed row count and timezone. Reads map the files instead of loading them and
+# only copy the rows of the requested period, so a long 1-minute history costs little
+# more to open than a daily one. Columns are written before the row count, so an
+# interrupted append is discarded on the next one.
+class BarStore(DataProvider):
+    COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _column_path(self, key, name):
+        return os.path.join(self.directory, key, name + ".bin")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, key, "meta.json")
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        path = self._meta_path(key)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _column(self, key, name, rows, dtype=np.float64):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(key, name), dtype=dtype, mode="r", shape=(rows,))
+
+    # Store bars newer than the last stored one; returns the number of rows appended
+    def append(self, ticker, data, interval="1d"):
+        key = series_key(ticker, interval)
+        if data is None or data.empty:
+            return 0
+        meta = self._read_meta(key) or {"rows": 0, "tz": None}
+        data = data.sort_index()
+        index = pd.DatetimeIndex(data.index)
+        stamps = index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        if meta["rows"]:
+            last = self._column(key, "Timestamp", meta["rows"], np.int64)[-1]
+            new = stamps > last
+            data, stamps = data[new], stamps[new]
+            if data.empty:
+                return 0
+        else:
+            meta["tz"] = str(index.tz) if index.tz is not None else None
+
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        columns = {"Timestamp": stamps}
+        columns.update({name: data[name].to_numpy(dtype=np.float64) for name in self.COLUMNS})
+        for name, values in columns.items():
+            with open(self._column_path(key, name), "ab") as f:
+                f.truncate(meta["rows"] * values.itemsize)
+                f.write(values.tobytes())
+        meta["rows"] += len(stamps)
+        self._write_meta(key, meta)
+        return len(stamps)
+
+    # Pull a period from another provider (Yahoo by default) and append what is new
+    def sync(self, ticker, period="7d", interval="1m", source=None):
+        source = YFinanceProvider() if source is None else source
+        return self.append(ticker, source.get_history(ticker, period, interval), interval)
+
+    # Bars with start <= timestamp < stop, as a regular OHLCV frame
+    def read(self, ticker, interval="1d", start=None, stop=None):
+        key = series_key(ticker, interval)
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        stamps = self._column(key, "Timestamp", meta["rows"], np.int64)
+        lo = 0 if start is None else int(np.searchsorted(stamps, self._ns(start, meta["tz"])))
+        hi = len(stamps) if stop is None else int(np.searchsorted(stamps, self._ns(stop, meta["tz"])))
+
+        index = pd.DatetimeIndex(np.array(stamps[lo:hi]).view("datetime64[ns]"), name="Date")
+        if meta["tz"] is not None:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        columns = {name: np.array(self._column(key, name, meta["rows"])[lo:hi]) for name in self.COLUMNS}
+        return pd.DataFrame(columns, index=index)
+
+    @staticmethod
+    def _ns(timestamp, tz):
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None and tz is not None:
+            timestamp = timestamp.tz_localize(tz)
+        return timestamp.as_unit("ns").value
+
+    # Periods are measured back from the last stored bar, like LocalFileProvider
+    def get_history(self, ticker, period="5y", interval="1d"):
+        key = series_key(ticker, interval)
+        meta = self._read_meta(key)
+        if meta is None or period == "max" or meta["rows"] == 0:
+            return self.read(ticker, interval)
+        last = pd.Timestamp(self._column(key, "Timestamp", meta["rows"], np.int64)[-1])
+        if meta["tz"] is not None:
+            last = last.tz_localize("UTC").tz_convert(meta["tz"]).tz_localize(None)
+        return self.read(ticker, interval, start=period_start(period, now=last))
+
+    def data_version(self, tickers, period="5y", interval="1d"):
+        return _digest([os.path.abspath(self.directory)]
+                       + [(self._read_meta(series_key(ticker, interval)) or {}).get("rows") for ticker in tickers])
+
+    def tickers(self, interval="1d"):
+        if not os.path.isdir(self.directory):
+            return []
+        keys = [key for key in os.listdir(self.directory) if self._read_meta(key) is not None]
+        if interval == "1d":
+            return sorted(key for key in keys if not _is_intraday_key(key))
+        suffix = "_" + interval
+        return sorted(key[:-len(suffix)] for key in keys if key.endswith(suffix))
+
+# Mixed-offset date strings (e.g. across DST) only parse as UTC
+def _has_utc_offset(index):
+    sample = str(index[0]) if len(index) else ""
+    return any(sign in sample[10:] for sign in "+-Z")
+
+# Provider used when get_stock_data is not given one explicitly
+default_provider = YFinanceProvider()
+if os.environ.get("MARKET_DATA_DIR"):
+    default_provider = LocalFileProvider(os.environ["MARKET_DATA_DIR"])
+elif os.environ.get("MARKET_DATA_STORE"):
+    default_provider = BarStore(os.environ["MARKET_DATA_STORE"])
+
+def get_provider():
+    return default_provider
+
+def set_default_provider(provider):
+    global default_provider
+    default_provider = provider
+
+# Download limits of fetch_many() callers that do not pass their own (main(), the dashboard),
+# configured from the environment to match the quota of the data source
+FETCH_RATE = float(os.environ.get("FETCH_RATE", "2.0"))
+FETCH_BURST = int(os.environ.get("FETCH_BURST", "1"))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", "3"))
+
+# Failures worth retrying: network and I/O errors (requests' connection, timeout and HTTP
+# errors are OSErrors). Anything else, e.g. a ValueError for an unsupported interval,
+# fails the same way every time and is reported at once.
+RETRY_ERRORS = (OSError,)
+
+# Token bucket shared by all fetch threads: `rate` requests per second, bursts up to `burst`
+class RateLimiter:
+    def __init__(self, rate=2.0, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Fetch one ticker, retrying failed network calls (RETRY_ERRORS) with exponential backoff
+def _fetch_with_retry(provider, ticker, period, interval, limiter, retries, backoff, profile):
+    for attempt in range(retries + 1):
+        try:
+            if not provider.is_local(ticker, period, interval):
+                limiter.acquire()
+            with profile.stage("fetch", ticker) as record:
+                data = provider.get_history(ticker, period, interval)
+                record["rows"] = 0 if data is None else len(data)
+            if data is None or data.empty:
+                return None, f"No data found for ticker: {ticker}"
+            return data, None
+        except Exception as e:
+            if attempt == retries or not isinstance(e, RETRY_ERRORS):
+                return None, f"Error fetching data for {ticker}: {e}"
+            time.sleep(backoff * 2 ** attempt)
+
+# Fetch many tickers concurrently, yielding (ticker, data, error) as each one completes
+def fetch_many(tickers, period="5y", provider=None, max_workers=8, rate=FETCH_RATE, burst=FETCH_BURST,
+               retries=FETCH_RETRIES, backoff=0.5, profile=NULL_PROFILE, interval="1d"):
+    provider = get_provider() if provider is None else provider
+    limiter = RateLimiter(rate, burst)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(_fetch_with_retry, provider, ticker, period, interval, limiter, retries,
+                        backoff, profile): ticker
+            for ticker in tickers
+        }
+        for future in as_completed(futures):
+            data, error = future.result()
+            yield futures[future], data, error
+    finally:
+        # A consumer that stops early (e.g. a cancelled job) does not wait for queued downloads
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,99 @@
+import itertools
+
+import pandas as pd
+import numpy as np
+
+from indicators import IndicatorGraph
+from trade_stats import REASON_COLUMNS, STAT_COLUMNS, merge_stats, summarize_stats
+from trading_strategy import (get_stock_data, index_ns, holding_window_ends, range_extremes, scan_exits,
+                              golden_cross_entries, StrategyConfig, DAY_NS)
+
+SWEEP_PARAMS = ["ma_short", "ma_long", "holding_period", "stop_loss_pct", "take_profit_pct"]
+
+# Expand the parameter grid into one row per combination
+def build_grid(ma_short, ma_long, holding_period, stop_loss_pct, take_profit_pct):
+    values = [ma_short, ma_long, holding_period, stop_loss_pct, take_profit_pct]
+    values = [[v] if np.isscalar(v) else list(v) for v in values]
+    return pd.DataFrame(list(itertools.product(*values)), columns=SWEEP_PARAMS)
+
+# Mergeable trade stats (see trade_stats) for every combination on one ticker
+# Pass a TradeBuffer as trades to also keep every trade, tagged with its grid row as ParamSet
+def sweep_ticker(data, grid, trades=None, ticker=None):
+    dates = index_ns(data.index)
+    close = data['Close'].to_numpy(dtype=np.float64)
+    # Each distinct window is computed once and shared by every combination
+    indicators = IndicatorGraph(data)
+
+    # One set of range tables per ticker, wide enough for the longest holding period
+    all_bars = np.arange(len(close))
+    width = int((holding_window_ends(dates, all_bars, int(grid['holding_period'].max())) - all_bars).max())
+    extremes = range_extremes(close, width)
+
+    rows = []
+    for (short, long_), pair_grid in grid.groupby(['ma_short', 'ma_long'], sort=False):
+        # Same warm-up rule as the backtest kernel: skip the first ma_long rows
+        entry_idx = golden_cross_entries(indicators.sma(int(short)), indicators.sma(int(long_)), int(long_))
+        buy_price = close[entry_idx]
+
+        for holding, combos in pair_grid.groupby('holding_period', sort=False):
+            # Holding windows only depend on the entries and the holding period
+            window_end = holding_window_ends(dates, entry_idx, int(holding))
+
+            for param_set, combo in zip(combos.index, combos.itertuples(index=False)):
+                if len(entry_idx) == 0:
+                    rows.append((*combo, 0, 0, 0.0, 0.0, np.nan, np.nan, 0.0) + (0,) * len(REASON_COLUMNS))
+                    continue
+                config = StrategyConfig(*combo)
+                exit_idx, reason = scan_exits(extremes, entry_idx, window_end, buy_price,
+                                              config.take_profit, config.stop_loss)
+                if trades is not None:
+                    trades.append_trades(ticker, data, entry_idx, exit_idx, reason, param_set=param_set)
+                profit_pct = (close[exit_idx] / buy_price - 1) * 100
+                holding_days = (dates[exit_idx] - dates[entry_idx]) // DAY_NS
+                reasons = np.bincount(reason, minlength=len(REASON_COLUMNS))
+                rows.append((*combo, len(entry_idx), int((profit_pct > 0).sum()), float(profit_pct.sum()),
+                             float(((profit_pct - profit_pct.mean()) ** 2).sum()), float(profit_pct.min()),
+                             float(profit_pct.max()), float(holding_days.sum()), *reasons))
+
+    return pd.DataFrame(rows, columns=SWEEP_PARAMS + STAT_COLUMNS)
+
+# Grid-search strategy parameters over a list of tickers
+def run_sweep(tickers, ma_short=50, ma_long=200, holding_period=60, stop_loss_pct=10.0,
+              take_profit_pct=15.0, period="5y", per_ticker=False, provider=None, trades=None):
+    if isinstance(tickers, str):
+        tickers = [tickers]
+
+    grid = build_grid(ma_short, ma_long, holding_period, stop_loss_pct, take_profit_pct)
+    print(f"Sweeping {len(grid)} parameter combinations over {len(tickers)} tickers")
+
+    ticker_results = []
+    for ticker in tickers:
+        data = get_stock_data(ticker, period, provider)
+        if data is None:
+            continue
+        result = sweep_ticker(data, grid, trades, ticker)
+        result.insert(0, 'Ticker', ticker)
+        ticker_results.append(result)
+
+    if not ticker_results:
+        return pd.DataFrame()
+
+    results = pd.concat(ticker_results, ignore_index=True)
+    if not per_ticker:
+        # Per-ticker stats merge exactly, including the profit spread
+        results = merge_stats(results.set_index(SWEEP_PARAMS)[STAT_COLUMNS]).reset_index()
+    return summarize_sweep(results)
+
+# Turn raw stats into win rate, average profit, its spread and exit-reason shares
+def summarize_sweep(results):
+    return summarize_stats(results).drop(columns=['ProfitSum', 'ProfitM2', 'HoldingDaysSum'])
+
+# Only run this if the script is executed directly
+if __name__ == "__main__":
+    # Example usage
+    results = run_sweep(["MSFT", "AAPL", "TSLA"],
+                        ma_short=[20, 50], ma_long=[100, 200],
+                        holding_period=[30, 60, 90],
+                        stop_loss_pct=[5.0, 10.0], take_profit_pct=[10.0, 15.0, 25.0])
+    if not results.empty:
+        print(results.sort_values('AvgProfit', ascending=False).head(10).to_string())
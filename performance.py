@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+# Upper bound on (groups x days) cells held in memory per batch
+BATCH_ELEMENTS = 4_000_000
+PERIODS_PER_YEAR = 365
+# Spans shorter than this get no CAGR: annualizing a few days' return is meaningless
+MIN_CAGR_DAYS = 365
+
+METRIC_COLUMNS = ["Trades", "Days", "TotalReturn", "CAGR", "MaxDrawdown", "Sharpe", "Sortino", "Exposure"]
+
+# Calendar day numbers of a date column, in each trade's local time (UTC for mixed timezones)
+def _day_numbers(dates):
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, utc=True)
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.to_numpy(dtype="datetime64[D]").view(np.int64)
+
+# Trade intervals as (group, first accrual day, last accrual day, daily return) arrays
+#
+# A trade's return is spread evenly (compounding) over the days after its entry up to
+# its exit day, so a same-day trade lands on its exit day. Days are relative to day0.
+def _trade_intervals(positions, by):
+    positions = positions[positions['ProfitPct'].notna()]
+    if by:
+        grouped = positions.groupby(by, sort=False, observed=True)
+        group = grouped.ngroup().to_numpy()
+        index = grouped.size().index
+    else:
+        group = np.zeros(len(positions), dtype=np.int64)
+        index = pd.RangeIndex(1)
+    buy = _day_numbers(positions['BuyDate'])
+    sell = _day_numbers(positions['SellDate'])
+    day0 = buy.min()
+    first = np.minimum(buy + 1, sell) - day0
+    last = sell - day0
+    daily = np.expm1(np.log1p(positions['ProfitPct'].to_numpy(dtype=np.float64) / 100) / (last - first + 1))
+    return index, group, first, last, daily, buy - day0, day0
+
+# Per-day sums of interval values for a block of groups: one difference array, one cumsum
+def _expand(group, first, last, values, n_groups, n_days):
+    width = n_days + 1
+    diff = np.bincount(group * width + first, weights=values, minlength=n_groups * width)
+    diff -= np.bincount(group * width + last + 1, weights=values, minlength=n_groups * width)
+    return np.cumsum(diff.reshape(n_groups, width), axis=1)[:, :n_days]
+
+# Daily returns (groups x days) of an equal-weight sleeve holding each group's open trades;
+# days without an open trade are in cash and return 0
+def _daily_returns(group, first, last, daily, n_groups, n_days):
+    ones = np.ones(len(group))
+    open_trades = np.rint(_expand(group, first, last, ones, n_groups, n_days))
+    returns = _expand(group, first, last, daily, n_groups, n_days)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.where(open_trades > 0, returns / open_trades, 0.0)
+    return returns, open_trades > 0
+
+# Equity, drawdown and return-distribution metrics of every group, computed in batches
+def _group_metrics(returns, invested, start, stop):
+    days = np.arange(returns.shape[1])
+    in_span = (days >= start[:, None]) & (days <= stop[:, None])
+    n_days = stop - start + 1
+
+    log_equity = np.cumsum(np.log1p(returns), axis=1)
+    # Equity starts at 1, so the running peak never drops below it
+    peak = np.maximum.accumulate(np.maximum(log_equity, 0.0), axis=1)
+    total = log_equity[:, -1]
+
+    mean = returns.sum(axis=1) / n_days
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt((((returns - mean[:, None]) ** 2) * in_span).sum(axis=1) / (n_days - 1))
+        downside = np.sqrt((np.minimum(returns, 0.0) ** 2).sum(axis=1) / n_days)
+        annual = np.sqrt(PERIODS_PER_YEAR)
+        return {
+            "Days": n_days,
+            "TotalReturn": np.expm1(total) * 100,
+            "CAGR": np.where(n_days >= MIN_CAGR_DAYS, np.expm1(total * PERIODS_PER_YEAR / n_days) * 100, np.nan),
+            "MaxDrawdown": np.minimum(np.expm1(log_equity - peak).min(axis=1), 0.0) * 100,
+            "Sharpe": np.where(std > 0, mean / std * annual, np.nan),
+            "Sortino": np.where(downside > 0, mean / downside * annual, np.nan),
+            "Exposure": (invested & in_span).sum(axis=1) / n_days * 100,
+        }
+
+# Risk metrics of every group of trades (by ticker by default, e.g. ["Ticker", "ParamSet"])
+#
+# Each group is an equal-weight sleeve of its open trades, with returns spread over the
+# holding days (see _trade_intervals). Trades become daily series through difference
+# arrays and cumulative sums, so there is no per-trade or per-day Python loop; groups
+# are processed in batches of BATCH_ELEMENTS cells. Sharpe and Sortino are annualized
+# from calendar days with a zero risk-free rate; percentages are in percent. Spreading a
+# trade's return evenly hides its swings between entry and exit, so these series are
+# smoother than marked-to-market ones (see portfolio.unrealized_pnl for that).
+def performance_metrics(positions, by=("Ticker",)):
+    by = [by] if isinstance(by, str) else list(by)
+    if positions.empty or positions['ProfitPct'].notna().sum() == 0:
+        return pd.DataFrame(columns=by + METRIC_COLUMNS)
+    index, group, first, last, daily, entry, _ = _trade_intervals(positions, by)
+    n_groups = len(index)
+    n_days = int(last.max()) + 1
+    # Each group's span runs from its first entry day to its last exit day
+    start = np.full(n_groups, n_days, dtype=np.int64)
+    np.minimum.at(start, group, entry)
+    stop = np.zeros(n_groups, dtype=np.int64)
+    np.maximum.at(stop, group, last)
+
+    order = np.argsort(group, kind="stable")
+    bounds = np.searchsorted(group[order], np.arange(n_groups + 1))
+    block = max(1, BATCH_ELEMENTS // n_days)
+    parts = []
+    for lo in range(0, n_groups, block):
+        hi = min(lo + block, n_groups)
+        rows = order[bounds[lo]:bounds[hi]]
+        returns, invested = _daily_returns(group[rows] - lo, first[rows], last[rows], daily[rows], hi - lo, n_days)
+        parts.append(pd.DataFrame(_group_metrics(returns, invested, start[lo:hi], stop[lo:hi])))
+
+    metrics = pd.concat(parts, ignore_index=True)
+    metrics.insert(0, "Trades", np.bincount(group, minlength=n_groups))
+    metrics.index = index
+    return metrics.reset_index(drop=not by)[by + METRIC_COLUMNS]
+
+# Daily equity curve (starting at 1) and drawdown of the equal-weight sleeve of all trades
+def equity_curve(positions):
+    if positions.empty or positions['ProfitPct'].notna().sum() == 0:
+        return pd.DataFrame(columns=["Equity", "Drawdown"])
+    _, group, first, last, daily, _, day0 = _trade_intervals(positions, [])
+    n_days = int(last.max()) + 1
+    returns, _ = _daily_returns(group, first, last, daily, 1, n_days)
+    equity = np.exp(np.cumsum(np.log1p(returns[0])))
+    days = pd.to_datetime(np.arange(day0, day0 + n_days), unit="D")
+    drawdown = (equity / np.maximum.accumulate(np.maximum(equity, 1.0)) - 1) * 100
+    return pd.DataFrame({"Equity": equity, "Drawdown": drawdown}, index=pd.DatetimeIndex(days, name="Date"))
@@ -0,0 +1,117 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# Event kinds; exits sort before entries on the same timestamp so their cash is reusable
+EXIT, ENTRY = 0, 1
+
+# Date-ordered (timestamp, kind, trade) events for one ticker's positions; a trade that
+# exits on its entry bar has no exit event (its exit would sort before its entry)
+def _ticker_events(trades):
+    events = [(buy, ENTRY, i) for i, buy in zip(trades.index, trades['BuyDate'])]
+    events += [(sell, EXIT, i) for i, buy, sell in zip(trades.index, trades['BuyDate'], trades['SellDate'])
+               if sell != buy]
+    events.sort()
+    return events
+
+# Shared-capital simulation over all tickers' trades
+#
+# Entry and exit events from every ticker are merged in date order through a heap
+# (heapq.merge keeps one head per ticker, so the cost is O(events log tickers)).
+# Each entry takes position_size x current equity (at cost) if a slot is free under
+# max_positions and there is enough cash; otherwise the signal is skipped. Same-bar
+# trades (BuyDate == SellDate) are settled as soon as they are entered.
+def simulate_portfolio(positions, initial_capital=100_000.0, position_size=0.1, max_positions=10,
+                       commission_pct=0.0, allow_pyramiding=False, prices=None):
+    if positions.empty:
+        return pd.DataFrame(), pd.Series(dtype=float, name="Equity")
+
+    positions = positions.reset_index(drop=True)
+    streams = [_ticker_events(trades) for _, trades in positions.groupby('Ticker', sort=False)]
+
+    cash = float(initial_capital)
+    open_trades = {}             # trade row -> shares
+    held_tickers = {}            # ticker -> open position count
+    cost_basis = 0.0
+    shares = np.zeros(len(positions))
+    allocation = np.zeros(len(positions))
+    taken = np.zeros(len(positions), dtype=bool)
+    equity_dates = []
+    equity_values = []
+
+    buy_price = positions['BuyPrice'].to_numpy(dtype=np.float64)
+    sell_price = positions['SellPrice'].to_numpy(dtype=np.float64)
+    tickers = positions['Ticker'].to_numpy()
+    same_bar = (positions['SellDate'] == positions['BuyDate']).to_numpy()
+    fee = commission_pct / 100
+
+    for timestamp, kind, i in heapq.merge(*streams):
+        if kind == ENTRY:
+            if len(open_trades) >= max_positions:
+                continue
+            if not allow_pyramiding and held_tickers.get(tickers[i], 0) > 0:
+                continue
+            budget = (cash + cost_basis) * position_size
+            if budget <= 0 or budget > cash:
+                continue
+            n_shares = budget * (1 - fee) / buy_price[i]
+            cash -= budget
+            cost_basis += budget
+            open_trades[i] = n_shares
+            held_tickers[tickers[i]] = held_tickers.get(tickers[i], 0) + 1
+            shares[i] = n_shares
+            allocation[i] = budget
+            taken[i] = True
+        if kind == EXIT or same_bar[i]:
+            if i not in open_trades:
+                continue
+            n_shares = open_trades.pop(i)
+            cash += n_shares * sell_price[i] * (1 - fee)
+            cost_basis -= allocation[i]
+            held_tickers[tickers[i]] -= 1
+        equity_dates.append(timestamp)
+        equity_values.append(cash + cost_basis)
+
+    trades = positions.assign(Shares=shares, Allocation=allocation)[taken]
+    trades = trades.assign(PnL=trades['Shares'] * trades['SellPrice'] * (1 - fee) - trades['Allocation'])
+
+    # Equity at cost after each event, carried forward to one value per calendar day
+    equity = pd.Series(equity_values, index=pd.DatetimeIndex(equity_dates), name="Equity")
+    equity = equity[~equity.index.normalize().duplicated(keep="last")]
+    equity.index = equity.index.normalize()
+    days = pd.date_range(equity.index[0], equity.index[-1], freq="D")
+    equity = equity.reindex(days).ffill()
+
+    if prices is not None:
+        equity = equity + unrealized_pnl(trades, prices, days)
+    return trades, equity
+
+# Mark-to-market adjustment of open positions on each day (requires daily Close series)
+def unrealized_pnl(trades, prices, days):
+    pnl = np.zeros(len(days))
+    for ticker, ticker_trades in trades.groupby('Ticker', sort=False):
+        if ticker not in prices:
+            continue
+        close = prices[ticker].copy()
+        close.index = close.index.normalize()
+        close = close[~close.index.duplicated(keep="last")].reindex(days).ffill().to_numpy()
+        day_index = days.get_indexer(ticker_trades['BuyDate'].dt.normalize())
+        exit_index = days.get_indexer(ticker_trades['SellDate'].dt.normalize())
+        for start, stop, n_shares, cost in zip(day_index, exit_index, ticker_trades['Shares'],
+                                               ticker_trades['Allocation']):
+            pnl[start:stop] += n_shares * close[start:stop] - cost
+    return np.nan_to_num(pnl)
+
+# Headline numbers for a simulated portfolio
+def portfolio_summary(trades, equity, initial_capital=100_000.0, signals=None):
+    if equity.empty:
+        return {}
+    final = float(equity.iloc[-1])
+    return {
+        "Final Equity": final,
+        "Total Return (%)": (final / initial_capital - 1) * 100,
+        "Trades Taken": len(trades),
+        "Signals Skipped": None if signals is None else signals - len(trades),
+        "Max Drawdown (%)": float(((equity / equity.cummax()) - 1).min() * 100),
+    }
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+
+from trade_stats import partial_stats
+from trading_strategy import index_ns
+
+PARAM_COLUMNS = ["ma_short", "ma_long", "holding_period", "holding_unit", "stop_loss_pct", "take_profit_pct",
+                 "exit_mode", "trailing_stop_pct"]
+METRICS = ["avg_profit", "win_rate", "profit_sum", "trades"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_key TEXT PRIMARY KEY,
+    tickers TEXT, period TEXT, interval TEXT, data_version TEXT,
+    ma_short TEXT, ma_long TEXT, holding_period INTEGER, holding_unit TEXT,
+    stop_loss_pct REAL, take_profit_pct REAL, exit_mode TEXT, trailing_stop_pct REAL,
+    columns TEXT, n_trades INTEGER, nbytes INTEGER, created REAL, last_used REAL
+);
+CREATE TABLE IF NOT EXISTS ticker_stats (
+    run_key TEXT, ticker TEXT, tz TEXT, trades INTEGER, win_trades INTEGER, profit_sum REAL,
+    profit_m2 REAL, min_profit REAL, max_profit REAL, stop_loss INTEGER, target_reached INTEGER,
+    max_holding INTEGER, trailing_stop INTEGER, holding_days_sum REAL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    run_key TEXT, seq INTEGER, Ticker TEXT, BuyDate INTEGER, BuyPrice REAL, BuyOpen REAL, BuyHigh REAL,
+    BuyLow REAL, SellDate INTEGER, SellPrice REAL, SellOpen REAL, SellHigh REAL, SellLow REAL,
+    HoldingDays INTEGER, ProfitPct REAL, SellReason TEXT
+);
+CREATE INDEX IF NOT EXISTS ticker_stats_ticker ON ticker_stats (ticker);
+CREATE INDEX IF NOT EXISTS ticker_stats_run ON ticker_stats (run_key);
+CREATE INDEX IF NOT EXISTS trades_run ON trades (run_key, seq);
+"""
+
+TICKER_STAT_COLUMNS = ["run_key", "ticker", "tz", "trades", "win_trades", "profit_sum", "min_profit",
+                       "max_profit", "stop_loss", "target_reached", "max_holding", "holding_days_sum",
+                       "trailing_stop", "profit_m2"]
+
+TRADE_COLUMNS = ["Ticker", "BuyDate", "BuyPrice", "BuyOpen", "BuyHigh", "BuyLow", "SellDate", "SellPrice",
+                 "SellOpen", "SellHigh", "SellLow", "HoldingDays", "ProfitPct", "SellReason"]
+
+# Identity of one backtest: tickers (in order), data version, period and strategy parameters
+def run_key(tickers, config, period="5y", interval="1d", data_version=""):
+    spec = {"tickers": list(tickers), "period": period, "interval": interval,
+            "data_version": data_version, **asdict(config)}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+# SQLite store of finished backtests: positions plus per-ticker summary rows
+#
+# Runs are keyed by run_key(), so a repeated backtest on unchanged data is answered by
+# get() without recomputing. The per-ticker rows let questions such as "best take-profit
+# for TSLA across all stored runs" be answered from SQL alone. Once the stored runs
+# exceed max_bytes (estimated from their positions frames), the least recently read
+# runs are evicted. A new connection is opened per call, so threads can share a store.
+class ResultStore:
+    def __init__(self, path=".backtest_results.db", max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        with self._init_lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with closing(sqlite3.connect(self.path)) as conn:
+                    conn.executescript(SCHEMA)
+                self._initialized = True
+        return closing(sqlite3.connect(self.path, timeout=30))
+
+    def __contains__(self, key):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM runs WHERE run_key = ?", (key,)).fetchone() is not None
+
+    # Stored positions frame of a run (None if unknown); marks the run as recently used
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT columns FROM runs WHERE run_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute("UPDATE runs SET last_used = ? WHERE run_key = ?", (time.time(), key))
+            trades = pd.read_sql_query(f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades WHERE run_key = ? "
+                                       "ORDER BY seq", conn, params=(key,))
+            zones = dict(conn.execute("SELECT ticker, tz FROM ticker_stats WHERE run_key = ?", (key,)).fetchall())
+
+        columns = json.loads(row[0])
+        if trades.empty:
+            return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+        # Rebuild per ticker so each keeps its own timezone, as when main() concatenates them
+        frames = []
+        for ticker, group in trades.groupby("Ticker", sort=False):
+            group = group.reset_index(drop=True)
+            for col in ["BuyDate", "SellDate"]:
+                dates = pd.DatetimeIndex(group[col].to_numpy().view("datetime64[ns]"))
+                tz = zones.get(ticker)
+                group[col] = dates.tz_localize("UTC").tz_convert(tz) if tz else dates
+            frames.append(group)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def put(self, key, positions, tickers, config, period="5y", interval="1d", data_version=""):
+        now = time.time()
+        columns = list(positions.columns)
+        nbytes = int(positions.memory_usage(deep=True).sum()) if not positions.empty else 0
+        params = asdict(config)
+        run = {"run_key": key, "tickers": json.dumps(list(tickers)), "period": period, "interval": interval,
+               "data_version": data_version, "columns": json.dumps(columns), "n_trades": len(positions),
+               "nbytes": nbytes, "created": now, "last_used": now}
+        run.update({col: str(params[col]) if col in ("ma_short", "ma_long") else params[col]
+                    for col in PARAM_COLUMNS})
+
+        with self._connect() as conn, conn:
+            self._delete(conn, [key])
+            conn.execute(f"INSERT INTO runs ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})",
+                         tuple(run.values()))
+            if not positions.empty:
+                conn.executemany(f"INSERT INTO ticker_stats ({', '.join(TICKER_STAT_COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(TICKER_STAT_COLUMNS))})",
+                                 _ticker_stats(key, positions))
+                conn.executemany(f"INSERT INTO trades VALUES ({', '.join('?' * (len(TRADE_COLUMNS) + 2))})",
+                                 _trade_rows(key, positions))
+        self.evict()
+
+    def _delete(self, conn, keys):
+        for table in ("runs", "ticker_stats", "trades"):
+            conn.executemany(f"DELETE FROM {table} WHERE run_key = ?", [(key,) for key in keys])
+
+    # Drop least recently used runs until the stored total is within max_bytes
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return []
+        with self._connect() as conn, conn:
+            rows = conn.execute("SELECT run_key, nbytes FROM runs ORDER BY last_used DESC").fetchall()
+            total = 0
+            evicted = []
+            for key, nbytes in rows:
+                total += nbytes
+                if total > max_bytes:
+                    evicted.append(key)
+            self._delete(conn, evicted)
+        return evicted
+
+    def clear(self):
+        with self._connect() as conn, conn:
+            for table in ("runs", "ticker_stats", "trades"):
+                conn.execute(f"DELETE FROM {table}")
+
+    # One row per stored run with its parameters, newest first
+    def runs(self):
+        with self._connect() as conn:
+            runs = pd.read_sql_query("SELECT * FROM runs ORDER BY created DESC", conn)
+        return runs.drop(columns=["columns"])
+
+    # Per-ticker results of every stored run, joined with the run's parameters
+    def ticker_stats(self, ticker=None):
+        query = ("SELECT s.*, r.period, r.interval, r.data_version, "
+                 + ", ".join(f"r.{col}" for col in PARAM_COLUMNS)
+                 + " FROM ticker_stats s JOIN runs r USING (run_key)")
+        with self._connect() as conn:
+            if ticker is None:
+                return pd.read_sql_query(query, conn)
+            return pd.read_sql_query(query + " WHERE s.ticker = ?", conn, params=(ticker,))
+
+    # Stored results for a ticker aggregated by one parameter, best metric first
+    def best(self, ticker, param="take_profit_pct", metric="avg_profit", min_trades=1):
+        if param not in PARAM_COLUMNS:
+            raise ValueError(f"Unknown parameter: {param}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        query = f"""
+            SELECT r.{param} AS {param}, COUNT(DISTINCT s.run_key) AS runs, SUM(s.trades) AS trades,
+                   SUM(s.win_trades) * 100.0 / SUM(s.trades) AS win_rate,
+                   SUM(s.profit_sum) AS profit_sum, SUM(s.profit_sum) / SUM(s.trades) AS avg_profit,
+                   -- Merged M2 of the runs' partial stats: sum(M2_i + n_i mean_i^2) - n mean^2
+                   SUM(s.profit_m2 + s.profit_sum * s.profit_sum / s.trades)
+                       - SUM(s.profit_sum) * SUM(s.profit_sum) / SUM(s.trades) AS profit_m2
+            FROM ticker_stats s JOIN runs r USING (run_key)
+            WHERE s.ticker = ?
+            GROUP BY r.{param}
+            HAVING SUM(s.trades) >= ?
+            ORDER BY {metric} DESC
+        """
+        with self._connect() as conn:
+            best = pd.read_sql_query(query, conn, params=(ticker, min_trades))
+        # SQLite builds may lack SQRT, so the spread is finished here
+        best["std_profit"] = np.sqrt(best.pop("profit_m2").clip(lower=0) / (best["trades"] - 1).where(best["trades"] > 1))
+        return best
+
+# Per-ticker rows hold the mergeable partial stats, so queries can combine them across runs
+def _ticker_stats(key, positions):
+    stats = partial_stats(positions, "Ticker")
+    zones = {ticker: trades["BuyDate"].iloc[0].tz for ticker, trades in positions.groupby("Ticker", sort=False,
+                                                                                          observed=True)}
+    rows = []
+    for ticker, row in zip(stats.index, stats.itertuples(index=False)):
+        tz = zones[ticker]
+        rows.append((key, str(ticker), None if tz is None else str(tz), int(row.Trades), int(row.WinTrades),
+                     float(row.ProfitSum), float(row.MinProfit), float(row.MaxProfit), int(row.StopLoss),
+                     int(row.TargetReached), int(row.MaxHolding), float(row.HoldingDaysSum),
+                     int(row.TrailingStop), float(row.ProfitM2)))
+    return rows
+
+def _trade_rows(key, positions):
+    values = {col: positions[col].to_numpy() for col in TRADE_COLUMNS if col not in ("BuyDate", "SellDate")}
+    values["Ticker"] = positions["Ticker"].astype(str).to_numpy()
+    values["SellReason"] = positions["SellReason"].astype(str).to_numpy()
+    # Dates are stored as UTC nanoseconds; the timezone lives in ticker_stats. Tickers from
+    # different timezones leave object columns of Timestamps, which only convert via UTC
+    for col in ["BuyDate", "SellDate"]:
+        dates = positions[col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, utc=True)
+        values[col] = index_ns(dates)
+    columns = [values[col].tolist() for col in TRADE_COLUMNS]
+    return [(key, seq, *row) for seq, row in enumerate(zip(*columns))]
+
+# Store used by the dashboard and the CLI unless another one is passed in
+default_store = ResultStore(os.environ.get("BACKTEST_STORE", ".backtest_results.db"))
+
+def get_store():
+    return default_store
+
+# Stored positions of this run on the provider's current data, or None
+def load_run(store, provider, tickers, config, period="5y", interval="1d"):
+    data_version = provider.data_version(tickers, period, interval)
+    return store.get(run_key(tickers, config, period, interval, data_version))
+
+# Store a finished run. Its downloads may have refreshed the provider's data, so the
+# data version is read again rather than reusing the one looked up before the run.
+def store_run(store, provider, tickers, positions, config, period="5y", interval="1d"):
+    data_version = provider.data_version(tickers, period, interval)
+    store.put(run_key(tickers, config, period, interval, data_version), positions, tickers, config,
+              period, interval, data_version)
+
+def set_default_store(store):
+    global default_store
+    default_store = store
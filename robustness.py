@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Upper bound on resampled trade returns held in memory per batch
+BATCH_ELEMENTS = 4_000_000
+
+# Win rate, mean return and max drawdown for every row of a (resamples x trades) matrix
+def _resample_metrics(samples):
+    win_rate = (samples > 0).mean(axis=1) * 100
+    mean_return = samples.mean(axis=1)
+    # Compound the trade sequence in log space; drawdown is measured against the running peak
+    log_equity = np.cumsum(np.log1p(samples / 100), axis=1)
+    peak = np.maximum.accumulate(np.maximum(log_equity, 0.0), axis=1)
+    max_drawdown = (np.expm1(log_equity - peak).min(axis=1)) * 100
+    return np.column_stack([win_rate, mean_return, np.minimum(max_drawdown, 0.0)])
+
+# Resample in batches with one random generator; returns a (n_resamples x 3) metric array
+def _run_resamples(profit_pct, n_resamples, seed, method):
+    rng = np.random.default_rng(seed)
+    n_trades = len(profit_pct)
+    batch = max(1, BATCH_ELEMENTS // n_trades)
+    results = []
+    for start in range(0, n_resamples, batch):
+        size = min(batch, n_resamples - start)
+        if method == "bootstrap":
+            samples = profit_pct[rng.integers(0, n_trades, size=(size, n_trades))]
+        else:
+            samples = rng.permuted(np.broadcast_to(profit_pct, (size, n_trades)), axis=1)
+        results.append(_resample_metrics(samples))
+    return np.concatenate(results)
+
+# Confidence intervals for win rate, mean return and max drawdown of a trade sequence
+#
+# method="bootstrap" resamples trades with replacement; method="permutation" shuffles
+# their order, which only changes the drawdown. With processes > 1 the resamples are
+# split across a process pool using independent child seeds, so results stay reproducible.
+def bootstrap_trades(profit_pct, n_resamples=100_000, seed=None, confidence=0.95,
+                     method="bootstrap", processes=None):
+    if method not in ("bootstrap", "permutation"):
+        raise ValueError(f"Unknown method: {method}")
+    profit_pct = np.asarray(profit_pct, dtype=np.float64)
+    profit_pct = profit_pct[~np.isnan(profit_pct)]
+    if len(profit_pct) == 0:
+        return pd.DataFrame()
+
+    if processes and processes > 1:
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        counts = [len(part) for part in np.array_split(np.arange(n_resamples), processes)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = pool.map(_run_resamples, [profit_pct] * processes, counts, seeds, [method] * processes)
+            metrics = np.concatenate(list(parts))
+    else:
+        metrics = _run_resamples(profit_pct, n_resamples, seed, method)
+
+    observed = _resample_metrics(profit_pct[None, :])[0]
+    alpha = (1 - confidence) / 2
+    lower, median, upper = np.quantile(metrics, [alpha, 0.5, 1 - alpha], axis=0)
+    return pd.DataFrame({
+        'Observed': observed,
+        'Median': median,
+        'Lower': lower,
+        'Upper': upper,
+    }, index=pd.Index(['Win Rate (%)', 'Mean Return (%)', 'Max Drawdown (%)'], name='Metric'))
@@ -0,0 +1,178 @@
+import json
+import os
+from collections import deque
+from dataclasses import asdict
+
+import pandas as pd
+
+from trading_strategy import DEFAULT_CONFIG, StrategyConfig
+
+# Recompute the running sums from the window every this many bars to stop float drift
+RESYNC_BARS = 1000
+
+# Timestamps are checkpointed with their timezone name so DST-aware zones survive a restore
+def _dump_timestamp(timestamp):
+    return [timestamp.isoformat(), None if timestamp.tz is None else str(timestamp.tz)]
+
+def _load_timestamp(value):
+    timestamp = pd.Timestamp(value[0])
+    return timestamp if value[1] is None else timestamp.tz_convert(value[1])
+
+# Incremental golden-cross engine for one ticker, fed one bar at a time
+#
+# Unlike the batch kernel, which scans the whole holding window and lets a later
+# stop-loss override an earlier take-profit, a live position exits on the first
+# bar that triggers (stop-loss still wins when both trigger on the same bar).
+# A trailing stop follows the highest close since entry, as in the batch kernel.
+class SignalStream:
+    def __init__(self, ticker, config=DEFAULT_CONFIG):
+        if isinstance(config.ma_short, str) or isinstance(config.ma_long, str):
+            raise ValueError("SignalStream needs moving-average windows given in bars")
+        if config.exit_mode != "close":
+            raise ValueError("SignalStream only sees closes and cannot apply intrabar exits")
+        self.ticker = ticker
+        self.config = config
+        self.closes = deque(maxlen=config.ma_long)
+        self.sum_short = 0.0
+        self.sum_long = 0.0
+        self.bars = 0
+        self.prev_ma = None            # (ma_short, ma_long) of the previous bar
+        self.prev_bar = None           # (timestamp, close) of the previous bar
+        self.positions = []            # open positions: dicts with BuyDate / BuyPrice / BuyBar / Peak
+
+    def _push_close(self, close):
+        config = self.config
+        if len(self.closes) >= config.ma_short:
+            self.sum_short -= self.closes[-config.ma_short]
+        if len(self.closes) == config.ma_long:
+            self.sum_long -= self.closes[0]
+        self.closes.append(close)
+        self.sum_short += close
+        self.sum_long += close
+        self.bars += 1
+
+        if self.bars % RESYNC_BARS == 0:
+            window = list(self.closes)
+            self.sum_short = sum(window[-config.ma_short:])
+            self.sum_long = sum(window)
+
+        ma_short = self.sum_short / config.ma_short if len(self.closes) >= config.ma_short else None
+        ma_long = self.sum_long / config.ma_long if len(self.closes) >= config.ma_long else None
+        return ma_short, ma_long
+
+    def _exit(self, position, date, price, reason):
+        return {
+            'Type': 'Exit',
+            'Ticker': self.ticker,
+            'BuyDate': position['BuyDate'],
+            'BuyPrice': position['BuyPrice'],
+            'SellDate': date,
+            'SellPrice': price,
+            'HoldingDays': (date - position['BuyDate']).days,
+            'ProfitPct': (price / position['BuyPrice'] - 1) * 100,
+            'SellReason': reason,
+        }
+
+    # Process one bar and return the entry/exit events it triggers
+    def update(self, timestamp, close):
+        timestamp = pd.Timestamp(timestamp)
+        config = self.config
+        events = []
+        still_open = []
+
+        for position in self.positions:
+            stop = position['BuyPrice'] * config.stop_loss
+            trail = position['Peak'] * config.trailing_stop if config.trailing_stop_pct else 0.0
+            if config.holding_unit == "bars":
+                expired = self.bars > position['BuyBar'] + config.holding_period
+            else:
+                expired = timestamp > position['BuyDate'] + pd.Timedelta(days=config.holding_period)
+            if expired:
+                # The previous bar was the last one inside the holding window
+                prev_date, prev_close = self.prev_bar
+                events.append(self._exit(position, prev_date, prev_close, "Max holding period"))
+            elif close <= max(stop, trail):
+                reason = "Trailing stop hit" if trail > stop else "Stop-loss hit"
+                events.append(self._exit(position, timestamp, close, reason))
+            elif close >= position['BuyPrice'] * config.take_profit:
+                events.append(self._exit(position, timestamp, close, "Target reached"))
+            else:
+                position['Peak'] = max(position['Peak'], close)
+                still_open.append(position)
+        self.positions = still_open
+
+        ma_short, ma_long = self._push_close(close)
+        # Entries need ma_long warm-up bars before them, as in the batch kernel
+        if (self.bars > config.ma_long and self.prev_ma is not None and None not in self.prev_ma
+                and ma_short > ma_long and self.prev_ma[0] <= self.prev_ma[1]):
+            position = {'BuyDate': timestamp, 'BuyPrice': close, 'BuyBar': self.bars - 1, 'Peak': close}
+            self.positions.append(position)
+            events.append({'Type': 'Entry', 'Ticker': self.ticker, 'BuyDate': timestamp, 'BuyPrice': close})
+
+        self.prev_ma = (ma_short, ma_long)
+        self.prev_bar = (timestamp, close)
+        return events
+
+    # Feed a whole frame of bars, e.g. to warm up from history
+    def update_frame(self, data):
+        events = []
+        for timestamp, close in zip(data.index, data['Close'].to_numpy()):
+            events.extend(self.update(timestamp, float(close)))
+        return events
+
+    # JSON-serializable checkpoint of the full engine state
+    def state_dict(self):
+        return {
+            'ticker': self.ticker,
+            'config': asdict(self.config),
+            'closes': list(self.closes),
+            'sum_short': self.sum_short,
+            'sum_long': self.sum_long,
+            'bars': self.bars,
+            'prev_ma': self.prev_ma,
+            'prev_bar': None if self.prev_bar is None else [_dump_timestamp(self.prev_bar[0]), self.prev_bar[1]],
+            'positions': [{'BuyDate': _dump_timestamp(p['BuyDate']), 'BuyPrice': p['BuyPrice'],
+                           'BuyBar': p['BuyBar'], 'Peak': p['Peak']} for p in self.positions],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stream = cls(state['ticker'], StrategyConfig(**state['config']))
+        stream.closes.extend(state['closes'])
+        stream.sum_short = state['sum_short']
+        stream.sum_long = state['sum_long']
+        stream.bars = state['bars']
+        stream.prev_ma = None if state['prev_ma'] is None else tuple(state['prev_ma'])
+        if state['prev_bar'] is not None:
+            stream.prev_bar = (_load_timestamp(state['prev_bar'][0]), state['prev_bar'][1])
+        stream.positions = [{'BuyDate': _load_timestamp(p['BuyDate']), 'BuyPrice': p['BuyPrice'],
+                             'BuyBar': p['BuyBar'], 'Peak': p['Peak']}
+                            for p in state['positions']]
+        return stream
+
+# One SignalStream per ticker with a single checkpoint file for the whole universe
+class SignalMonitor:
+    def __init__(self, config=DEFAULT_CONFIG):
+        self.config = config
+        self.streams = {}
+
+    def update(self, ticker, timestamp, close):
+        stream = self.streams.get(ticker)
+        if stream is None:
+            stream = self.streams[ticker] = SignalStream(ticker, self.config)
+        return stream.update(timestamp, close)
+
+    def save(self, path):
+        # Write to a temporary file first so a crash never leaves a half-written checkpoint
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({ticker: stream.state_dict() for ticker, stream in self.streams.items()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, config=DEFAULT_CONFIG):
+        monitor = cls(config)
+        with open(path) as f:
+            states = json.load(f)
+        monitor.streams = {ticker: SignalStream.from_state(state) for ticker, state in states.items()}
+        return monitor
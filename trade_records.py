@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from trading_strategy import DAY_NS, SELL_REASONS, index_ns
+
+# Preallocated, typed column storage for trades, appended in batches per ticker
+#
+# Prices are float64 by default (float32 halves their footprint), holding days are
+# int32, SellReason/Ticker are categorical codes and dates are int64 nanoseconds.
+# to_frame() wraps the filled part of every array without copying it; only
+# timezone-aware date columns need one localizing pass.
+class TradeBuffer:
+    PRICE_COLUMNS = ['BuyPrice', 'BuyOpen', 'BuyHigh', 'BuyLow',
+                     'SellPrice', 'SellOpen', 'SellHigh', 'SellLow']
+
+    def __init__(self, capacity=1024, price_dtype=np.float64):
+        self.size = 0
+        self.price_dtype = np.dtype(price_dtype)
+        self.tickers = []
+        self.ticker_codes = {}
+        self.tz = None
+        self.columns = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        dtypes = {'BuyDate': np.int64, 'SellDate': np.int64, 'HoldingDays': np.int32,
+                  'ProfitPct': np.float64, 'SellReason': np.int8, 'Ticker': np.int32, 'ParamSet': np.int32}
+        dtypes.update({col: self.price_dtype for col in self.PRICE_COLUMNS})
+        new_columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        for name, values in self.columns.items():
+            new_columns[name][:self.size] = values[:self.size]
+        self.columns = new_columns
+        self.capacity = capacity
+
+    # Grow geometrically so appends stay amortized O(1) per trade
+    def reserve(self, extra):
+        if self.size + extra > self.capacity:
+            self._allocate(max(self.size + extra, self.capacity * 2))
+
+    # Fix the category order of the Ticker column up front
+    def register_tickers(self, tickers):
+        for ticker in tickers:
+            self._ticker_code(ticker)
+
+    def _ticker_code(self, ticker):
+        if ticker not in self.ticker_codes:
+            self.ticker_codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return self.ticker_codes[ticker]
+
+    def _set_tz(self, index):
+        tz = getattr(index, "tz", None)
+        if self.size == 0 and self.tz is None:
+            self.tz = tz
+        elif self.tz is not None and str(tz) != str(self.tz):
+            # Mixed exchanges: keep everything in UTC
+            self.tz = "UTC"
+
+    # Append trades straight from the exit engine's bar positions, without a per-ticker frame
+    # Sells fill at the exit bar's Close unless the exit rules produced their own fill prices
+    def append_trades(self, ticker, data, entry_idx, exit_idx, reason, sell_price=None, param_set=-1):
+        n = len(entry_idx)
+        if n == 0:
+            return
+        self._set_tz(data.index)
+        self.reserve(n)
+        dates = index_ns(data.index)
+        close = data['Close'].to_numpy(dtype=np.float64)
+        sell_price = close[exit_idx] if sell_price is None else sell_price
+        values = {
+            'BuyDate': dates[entry_idx],
+            'SellDate': dates[exit_idx],
+            'BuyPrice': close[entry_idx],
+            'SellPrice': sell_price,
+            'ProfitPct': (sell_price / close[entry_idx] - 1) * 100,
+            'SellReason': reason,
+        }
+        for side, idx in (('Buy', entry_idx), ('Sell', exit_idx)):
+            for col in ['Open', 'High', 'Low']:
+                values[side + col] = data[col].to_numpy()[idx]
+        self._write(ticker, values, param_set)
+
+    # Append an existing positions frame (e.g. one returned by a worker process)
+    def append_frame(self, ticker, positions, param_set=-1):
+        if positions.empty:
+            return
+        self._set_tz(pd.DatetimeIndex(positions['BuyDate']))
+        self.reserve(len(positions))
+        reason_codes = {reason: code for code, reason in enumerate(SELL_REASONS)}
+        values = {col: positions[col].to_numpy() for col in self.PRICE_COLUMNS + ['ProfitPct']}
+        values['BuyDate'] = index_ns(positions['BuyDate'])
+        values['SellDate'] = index_ns(positions['SellDate'])
+        values['SellReason'] = positions['SellReason'].map(reason_codes).to_numpy()
+        self._write(ticker, values, param_set)
+
+    def _write(self, ticker, values, param_set):
+        start, stop = self.size, self.size + len(values['BuyDate'])
+        for name, column in values.items():
+            self.columns[name][start:stop] = column
+        # Timedelta.days floors, so integer division matches the positions frame
+        self.columns['HoldingDays'][start:stop] = (values['SellDate'] - values['BuyDate']) // DAY_NS
+        self.columns['Ticker'][start:stop] = self._ticker_code(ticker)
+        self.columns['ParamSet'][start:stop] = param_set
+        self.size = stop
+
+    def __len__(self):
+        return self.size
+
+    def nbytes(self):
+        return sum(values[:self.size].nbytes for values in self.columns.values())
+
+    def _dates(self, name, start, stop):
+        dates = self.columns[name][start:stop].view("datetime64[ns]")
+        if self.tz is None:
+            return dates
+        return pd.DatetimeIndex(dates).tz_localize("UTC").tz_convert(self.tz)
+
+    # DataFrame view of rows [start, stop) with the positions-frame column order
+    def to_frame(self, start=0, stop=None):
+        stop = self.size if stop is None else stop
+        cols = self.columns
+        frame = {
+            'BuyDate': self._dates('BuyDate', start, stop),
+            'BuyPrice': cols['BuyPrice'][start:stop],
+            'BuyOpen': cols['BuyOpen'][start:stop],
+            'BuyHigh': cols['BuyHigh'][start:stop],
+            'BuyLow': cols['BuyLow'][start:stop],
+            'SellDate': self._dates('SellDate', start, stop),
+            'SellPrice': cols['SellPrice'][start:stop],
+            'SellOpen': cols['SellOpen'][start:stop],
+            'SellHigh': cols['SellHigh'][start:stop],
+            'SellLow': cols['SellLow'][start:stop],
+            'HoldingDays': cols['HoldingDays'][start:stop],
+            'ProfitPct': cols['ProfitPct'][start:stop],
+            'SellReason': pd.Categorical.from_codes(cols['SellReason'][start:stop], list(SELL_REASONS),
+                                                    validate=False),
+            'Ticker': pd.Categorical.from_codes(cols['Ticker'][start:stop], self.tickers, validate=False),
+        }
+        if (cols['ParamSet'][start:stop] >= 0).any():
+            frame['ParamSet'] = cols['ParamSet'][start:stop]
+        return pd.DataFrame(frame, copy=False)
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from trading_strategy import SELL_REASONS
+
+# Exit-reason count columns, in SELL_REASONS order
+REASON_COLUMNS = ["StopLoss", "TargetReached", "MaxHolding", "TrailingStop"]
+STAT_COLUMNS = ["Trades", "WinTrades", "ProfitSum", "ProfitM2", "MinProfit", "MaxProfit",
+                "HoldingDaysSum"] + REASON_COLUMNS
+
+# Mergeable per-group trade statistics: one row per group, with the group keys as index
+#
+# Every column is a count, a sum, a min/max or ProfitM2 (the sum of squared deviations
+# from the group mean), so partials built on different workers, shards or machines
+# combine with merge_stats() into exactly the figures one pass over all trades would
+# give, without bringing the trades together. summarize_stats() derives the win rate,
+# mean, standard deviation and exit-reason shares. Trades without a ProfitPct are left out.
+def partial_stats(positions, by=("Ticker",)):
+    by = [by] if isinstance(by, str) else list(by)
+    if positions.empty:
+        return _empty_stats(by)
+    positions = positions[positions['ProfitPct'].notna()]
+    profit = positions['ProfitPct'].to_numpy(dtype=np.float64)
+    if by:
+        grouped = positions.groupby(by, sort=False, observed=True)
+        group = grouped.ngroup().to_numpy()
+        index = grouped.size().index
+    else:
+        group = np.zeros(len(positions), dtype=np.int64)
+        index = pd.RangeIndex(1)
+    n_groups = len(index)
+
+    count = np.bincount(group, minlength=n_groups)
+    total = np.bincount(group, weights=profit, minlength=n_groups)
+    mean = total / np.maximum(count, 1)
+    stats = {
+        'Trades': count,
+        'WinTrades': np.bincount(group, weights=profit > 0, minlength=n_groups).astype(np.int64),
+        'ProfitSum': total,
+        # Deviations from the exact group mean (two passes) rather than a running sum of squares
+        'ProfitM2': np.bincount(group, weights=(profit - mean[group]) ** 2, minlength=n_groups),
+        'MinProfit': _group_extreme(group, profit, n_groups, np.minimum),
+        'MaxProfit': _group_extreme(group, profit, n_groups, np.maximum),
+        'HoldingDaysSum': np.bincount(group, weights=positions['HoldingDays'].to_numpy(dtype=np.float64),
+                                      minlength=n_groups),
+    }
+    codes = reason_codes(positions['SellReason'])
+    reasons = np.bincount(group * len(REASON_COLUMNS) + codes, minlength=n_groups * len(REASON_COLUMNS))
+    for column, counts in zip(REASON_COLUMNS, reasons.reshape(n_groups, len(REASON_COLUMNS)).T):
+        stats[column] = counts
+    return pd.DataFrame(stats, index=index)
+
+# Reason codes of a SellReason column (strings or categories)
+def reason_codes(sell_reason):
+    return pd.Categorical(sell_reason.astype(str), categories=list(SELL_REASONS)).codes.astype(np.int64)
+
+def _group_extreme(group, values, n_groups, ufunc):
+    result = np.full(n_groups, np.inf if ufunc is np.minimum else -np.inf)
+    ufunc.at(result, group, values)
+    return np.where(np.isinf(result), np.nan, result)
+
+def _empty_stats(by):
+    if len(by) > 1:
+        index = pd.MultiIndex.from_arrays([[]] * len(by), names=by)
+    else:
+        index = pd.Index([], name=by[0] if by else None)
+    counts = ["Trades", "WinTrades"] + REASON_COLUMNS
+    return pd.DataFrame({col: np.empty(0, dtype=np.int64 if col in counts else np.float64)
+                         for col in STAT_COLUMNS}, index=index)
+
+# Combine partials (one frame or a list) per group of the given index levels; by=[] gives one total row
+#
+# Associative and order-independent: merging shard results in any grouping gives the
+# same totals. ProfitM2 uses the pairwise update M2 = sum(M2_i + n_i (mean_i - mean)^2).
+def merge_stats(partials, by=None):
+    stats = pd.concat(partials) if isinstance(partials, (list, tuple)) else partials
+    by = list(stats.index.names) if by is None else ([by] if isinstance(by, str) else list(by))
+    if stats.empty:
+        return _empty_stats(by)
+    if by:
+        grouped = stats.groupby(level=by, sort=False)
+        group = grouped.ngroup().to_numpy()
+        index = grouped.size().index
+    else:
+        group = np.zeros(len(stats), dtype=np.int64)
+        index = pd.RangeIndex(1)
+    n_groups = len(index)
+
+    count = stats['Trades'].to_numpy(dtype=np.float64)
+    total = stats['ProfitSum'].to_numpy(dtype=np.float64)
+    merged = {col: np.bincount(group, weights=stats[col].to_numpy(dtype=np.float64), minlength=n_groups)
+              for col in STAT_COLUMNS if col not in ("ProfitM2", "MinProfit", "MaxProfit")}
+    part_mean = total / np.maximum(count, 1)
+    mean = merged['ProfitSum'] / np.maximum(merged['Trades'], 1)
+    merged['ProfitM2'] = np.bincount(group, weights=stats['ProfitM2'].to_numpy(dtype=np.float64)
+                                     + count * (part_mean - mean[group]) ** 2, minlength=n_groups)
+    for col, ufunc in (('MinProfit', np.minimum), ('MaxProfit', np.maximum)):
+        values = stats[col].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        merged[col] = _group_extreme(group[valid], values[valid], n_groups, ufunc)
+    for col in ["Trades", "WinTrades"] + REASON_COLUMNS:
+        merged[col] = merged[col].astype(np.int64)
+    return pd.DataFrame(merged, index=index)[STAT_COLUMNS]
+
+# Derived figures of (merged) partials: win rate, mean and std of ProfitPct, average holding and reason shares
+def summarize_stats(stats):
+    trades = stats['Trades'].replace(0, np.nan)
+    summary = stats.assign(
+        WinRate=(stats['WinTrades'] / trades * 100).fillna(0.0),
+        AvgProfit=(stats['ProfitSum'] / trades).fillna(0.0),
+        # Sample standard deviation, like Series.std()
+        StdProfit=np.sqrt(stats['ProfitM2'] / (trades - 1).where(trades > 1)),
+        AvgHoldingDays=stats['HoldingDaysSum'] / trades,
+    )
+    for col in REASON_COLUMNS:
+        summary[f'{col}Pct'] = (stats[col] / trades * 100).fillna(0.0)
+    return summary
@@ -1,14 +1,19 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 
-# Download stock data
-def get_stock_data(ticker, period="5y"):
+import market_data
+from indicators import IndicatorGraph, cross_above, moving_average, rule_entries, warmup_bars
+from instrumentation import RunProfile, NULL_PROFILE
+
+# Download stock data from the configured market-data provider
+def get_stock_data(ticker, period="5y", provider=None, interval="1d"):
     try:
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period)
-        if data.empty:
+        provider = market_data.get_provider() if provider is None else provider
+        data = provider.get_history(ticker, period, interval)
+        if data is None or data.empty:
             print(f"No data found for ticker: {ticker}")
             return None
         return data
@@ -16,93 +21,360 @@ def get_stock_data(ticker, period="5y"):
         print(f"Error fetching data for {ticker}: {e}")
         return None
 
-# Calculate moving averages
-def calculate_moving_averages(data):
-    data['MA50'] = data['Close'].rolling(window=50).mean()
-    data['MA200'] = data['Close'].rolling(window=200).mean()
+# Calculate moving averages (MA50 / MA200 columns by default)
+def calculate_moving_averages(data, short=50, long=200):
+    graph = IndicatorGraph(data)
+    data[f'MA{short}'] = graph.sma(short)
+    data[f'MA{long}'] = graph.sma(long)
     return data
 
 # Identify golden cross (buy signals)
-def identify_golden_cross(data):
+def identify_golden_cross(data, short=50, long=200):
     data['Signal'] = 0
-    data['GoldenCross'] = (data['MA50'] > data['MA200']) & (data['MA50'].shift(1) <= data['MA200'].shift(1))
+    data['GoldenCross'] = cross_above(data[f'MA{short}'].to_numpy(), data[f'MA{long}'].to_numpy())
     return data
 
-# Implement trading strategy
-def implement_strategy(data):
-    positions = []
+# Align Close prices of many tickers on a common calendar (dates x tickers, NaN gaps)
+def close_panel(frames):
+    panel = pd.concat({ticker: data['Close'] for ticker, data in frames.items()}, axis=1).sort_index()
+    return panel.index, list(panel.columns), panel.to_numpy(dtype=np.float64)
 
-    # Need at least 200 days to calculate the 200-day MA
-    if len(data) < 200:
-        print("Not enough data for analysis (need at least 200 days)")
-        return pd.DataFrame(positions)
-    
-    data = data.iloc[200:].copy()
-    buy_dates = data[data['GoldenCross'] == True].index.tolist()
+# Rolling mean down each column using cumulative-sum windows; windows with a gap are NaN
+def moving_average_panel(closes, window):
+    valid = ~np.isnan(closes)
+    sums = np.zeros((closes.shape[0] + 1, closes.shape[1]))
+    counts = np.zeros((closes.shape[0] + 1, closes.shape[1]), dtype=np.int64)
+    np.cumsum(np.where(valid, closes, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
 
-    print(f"Found {len(buy_dates)} golden cross signals")
+    ma = np.full(closes.shape, np.nan)
+    if window <= closes.shape[0]:
+        window_sum = sums[window:] - sums[:-window]
+        window_count = counts[window:] - counts[:-window]
+        ma[window - 1:] = np.where(window_count == window, window_sum / window, np.nan)
+    return ma
 
-    for buy_date in buy_dates:
-        buy_price = data.loc[buy_date, 'Close']
-        buy_open = data.loc[buy_date, 'Open']
-        buy_high = data.loc[buy_date, 'High']
-        buy_low = data.loc[buy_date, 'Low']
-        
-        target_price = buy_price * 1.15  # Take-profit (15%)
-        stop_loss_price = buy_price * 0.90  # Stop-loss (10%)
-        max_sell_date = buy_date + pd.Timedelta(days=60)
-        sell_period = data.loc[buy_date:max_sell_date].copy()
-
-        # Check for stop-loss first
-        stop_loss_hit = sell_period[sell_period['Close'] <= stop_loss_price]
-        target_reached = sell_period[sell_period['Close'] >= target_price]
-
-        if not stop_loss_hit.empty:
-            sell_date = stop_loss_hit.index[0]
-            sell_price = stop_loss_hit.loc[sell_date, 'Close']
-            sell_open = data.loc[sell_date, 'Open']
-            sell_high = data.loc[sell_date, 'High']
-            sell_low = data.loc[sell_date, 'Low']
-            sell_reason = "Stop-loss hit"
-        elif not target_reached.empty:
-            sell_date = target_reached.index[0]
-            sell_price = target_reached.loc[sell_date, 'Close']
-            sell_open = data.loc[sell_date, 'Open']
-            sell_high = data.loc[sell_date, 'High']
-            sell_low = data.loc[sell_date, 'Low']
-            sell_reason = "Target reached"
-        else:
-            sell_date_candidates = sell_period.index.tolist()
-            if sell_date_candidates:
-                sell_date = sell_date_candidates[-1]
-                sell_price = data.loc[sell_date, 'Close']
-                sell_open = data.loc[sell_date, 'Open']
-                sell_high = data.loc[sell_date, 'High']
-                sell_low = data.loc[sell_date, 'Low']
-                sell_reason = "Max holding period"
-            else:
-                continue
+# MA50 and MA200 for every ticker in the panel
+def calculate_moving_averages_panel(closes, short=50, long=200):
+    return moving_average_panel(closes, short), moving_average_panel(closes, long)
 
-        holding_days = (sell_date - buy_date).days
-        profit_pct = (sell_price / buy_price - 1) * 100
-        
-        positions.append({
-            'BuyDate': buy_date,
-            'BuyPrice': buy_price,
-            'BuyOpen': buy_open,
-            'BuyHigh': buy_high,
-            'BuyLow': buy_low,
-            'SellDate': sell_date,
-            'SellPrice': sell_price,
-            'SellOpen': sell_open,
-            'SellHigh': sell_high,
-            'SellLow': sell_low,
-            'HoldingDays': holding_days,
-            'ProfitPct': profit_pct,
-            'SellReason': sell_reason
-        })
-
-    return pd.DataFrame(positions)
+# Golden cross flags for every ticker in the panel, same rule as identify_golden_cross
+def identify_golden_cross_panel(ma_short, ma_long):
+    cross = np.zeros(ma_short.shape, dtype=bool)
+    cross[1:] = (ma_short[1:] > ma_long[1:]) & (ma_short[:-1] <= ma_long[:-1])
+    return cross
+
+# Strategy parameters shared by the CLI and the dashboard backtests
+@dataclass(frozen=True)
+class StrategyConfig:
+    ma_short: int = 50             # bars, or a time window such as "4h" for intraday data
+    ma_long: int = 200
+    holding_period: int = 60       # calendar days, or bars with holding_unit="bars"
+    stop_loss_pct: float = 10.0
+    take_profit_pct: float = 15.0
+    holding_unit: str = "days"
+    exit_mode: str = "close"       # "close", or "intrabar": High/Low triggers with gap-aware Open fills
+    trailing_stop_pct: float = 0.0 # below the highest price since entry; 0 disables it
+
+    @property
+    def take_profit(self):
+        return 1 + self.take_profit_pct / 100
+
+    @property
+    def stop_loss(self):
+        return 1 - self.stop_loss_pct / 100
+
+    @property
+    def trailing_stop(self):
+        return 1 - self.trailing_stop_pct / 100
+
+    # Close-based fixed stops without a trailing stop go through the cheaper resolve_exits
+    @property
+    def close_only(self):
+        return self.exit_mode == "close" and not self.trailing_stop_pct
+
+DEFAULT_CONFIG = StrategyConfig()
+
+# Exit reasons, indexed by the codes returned from resolve_exits
+SELL_REASONS = np.array(["Stop-loss hit", "Target reached", "Max holding period", "Trailing stop hit"],
+                        dtype=object)
+STOP_LOSS, TARGET_REACHED, MAX_HOLDING, TRAILING_STOP = 0, 1, 2, 3
+EXIT_MODES = ("close", "intrabar")
+
+# Bar timestamps as int64 nanoseconds (UTC for tz-aware indexes)
+def index_ns(index):
+    return pd.DatetimeIndex(index).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+DAY_NS = 86_400_000_000_000
+
+# End (exclusive) of every signal's holding window: calendar days after the entry,
+# inclusive like a label slice, or a fixed number of bars after the entry bar
+def holding_window_ends(dates, entry_idx, holding_period=60, unit="days"):
+    if unit == "bars":
+        return np.minimum(entry_idx + holding_period + 1, len(dates))
+    if unit != "days":
+        raise ValueError(f"Unknown holding unit: {unit}")
+    max_dates = dates[entry_idx] + np.int64(holding_period) * DAY_NS
+    return np.searchsorted(dates, max_dates, side="right")
+
+# Sparse table of values: level k holds the min (or max) of values[i:i + 2**k]
+def range_levels(values, max_width, reduce=np.minimum):
+    # Missing prices never trigger an exit
+    levels = [np.where(np.isnan(values), np.inf if reduce is np.minimum else -np.inf, values)]
+    span = 1
+    while span * 2 <= max_width:
+        levels.append(reduce(levels[-1][:-span], levels[-1][span:]))
+        span *= 2
+    return levels
+
+# Min (lows) and max (highs) sparse tables of close
+def range_extremes(close, max_width):
+    return range_levels(close, max_width, np.minimum), range_levels(close, max_width, np.maximum)
+
+# Max of values[start:stop] per signal from a max table (stop > start, width within the table)
+def range_max(levels, start, stop):
+    k = np.floor(np.log2(stop - start)).astype(np.int64)
+    result = np.empty(len(start))
+    for level in np.unique(k):
+        rows = k == level
+        table = levels[level]
+        result[rows] = np.maximum(table[start[rows]], table[stop[rows] - (1 << level)])
+    return result
+
+# Per position j, the last i < stop[j] with values[i] >= threshold[j] (-1 if none in reach)
+#
+# Mirror image of first_crossing: blocks of 2**k bars ending at the search position are
+# skipped while their max stays below the threshold; reach is 2**(levels) - 1 bars.
+def previous_at_least(levels, values, stop, threshold):
+    pos = stop.copy()
+    for k in range(len(levels) - 1, -1, -1):
+        level = levels[k]
+        fits = pos - (1 << k) >= 0
+        clear = level[np.maximum(pos - (1 << k), 0)] < threshold
+        pos = np.where(fits & clear, pos - (1 << k), pos)
+    found = (pos > 0) & (values[np.maximum(pos - 1, 0)] >= threshold)
+    return np.where(found, pos - 1, -1)
+
+# First bar in [start, end) whose close is at or beyond threshold (end if none), per signal
+#
+# From the widest level down, every block of 2**k bars that fits in the window and has
+# no crossing is skipped, so each signal costs O(log window) regardless of bar size.
+def first_crossing(levels, start, end, threshold, below):
+    pos = start.copy()
+    for k in range(len(levels) - 1, -1, -1):
+        level = levels[k]
+        fits = pos + (1 << k) <= end
+        extreme = level[np.minimum(pos, len(level) - 1)]
+        clear = extreme > threshold if below else extreme < threshold
+        pos = np.where(fits & clear, pos + (1 << k), pos)
+    return pos
+
+# Stop-loss / take-profit / max-holding exits of every signal from shared sparse tables
+def scan_exits(extremes, entry_idx, window_end, buy_price, take_profit, stop_loss):
+    lows, highs = extremes
+    stop_at = first_crossing(lows, entry_idx, window_end, buy_price * stop_loss, below=True)
+    target_at = first_crossing(highs, entry_idx, window_end, buy_price * take_profit, below=False)
+
+    # Stop-loss anywhere in the window wins over take-profit, both win over the max-holding exit
+    has_stop = stop_at < window_end
+    has_target = target_at < window_end
+    exit_idx = np.where(has_stop, stop_at, np.where(has_target, target_at, window_end - 1))
+    reason = np.select([has_stop, has_target], [STOP_LOSS, TARGET_REACHED], MAX_HOLDING).astype(np.int8)
+    return exit_idx, reason
+
+# Resolve the exit bar of every signal in one batched pass over the price arrays
+#
+# Memory grows with bars x log(window) (one sparse-table level per power of two) and
+# time with that plus signals x log(window), not signals x window, so long holding
+# windows on minute bars stay cheap.
+def resolve_exits(dates, close, entry_idx, take_profit=1.15, stop_loss=0.90, holding_period=60,
+                  holding_unit="days"):
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    if len(entry_idx) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+
+    window_end = holding_window_ends(dates, entry_idx, holding_period, holding_unit)
+    extremes = range_extremes(close, int((window_end - entry_idx).max()))
+    return scan_exits(extremes, entry_idx, window_end, close[entry_idx], take_profit, stop_loss)
+
+# Trailing-stop trigger bar and stop level of every signal
+#
+# The stop trails the highest price since entry: Close (bars entry..j) in close mode, or
+# the buy price and High of the bars before j in intrabar mode, where Low[j] triggers.
+# "Low[j] <= trail x peak" holds exactly when the buy price or some earlier high reaches
+# Low[j] / trail, so the last such high before each bar is found once for the whole
+# series and the first trigger per signal is then a first crossing of those positions.
+def trailing_exits(low, high, start, window_end, buy_price, trail, lag, max_width):
+    width = max_width + lag
+    lows = range_levels(low, width, np.minimum)
+    highs = range_levels(high, width, np.maximum)
+    from_buy = first_crossing(lows, start, window_end, buy_price * trail, below=True)
+
+    bars = np.arange(len(low))
+    last_peak = previous_at_least(highs, high, bars + 1 - lag, low / trail)
+    peak_levels = range_levels(last_peak.astype(np.float64), width, np.maximum)
+    from_high = first_crossing(peak_levels, start, window_end, start, below=False)
+
+    trail_at = np.minimum(from_buy, from_high)
+    # Stop level at the trigger bar, from the highest price seen before it can trigger
+    peak = buy_price.copy()
+    stop = np.minimum(trail_at, window_end - 1) + 1 - lag
+    rows = stop > start
+    peak[rows] = np.maximum(peak[rows], range_max(highs, start[rows], stop[rows]))
+    return trail_at, peak * trail
+
+# Exits under intrabar and/or trailing-stop rules: exit bars, reason codes and fill prices
+#
+# Every rule is a first crossing over the sparse tables, so the cost matches resolve_exits.
+# The first trigger wins; on a shared bar the stops win over the take-profit. In close
+# mode the original rule of resolve_exits still holds: a fixed stop-loss anywhere in the
+# window wins over the take-profit (a trailing stop only exits earlier if it triggers
+# first). In intrabar mode bars after the entry trigger on Low/High and fill at the stop
+# or target level, or at Open when the bar gaps through it (a gap through the target wins
+# over a stop on the same bar); max-holding exits fill at Close.
+def resolve_bar_exits(dates, prices, entry_idx, config=DEFAULT_CONFIG):
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    if len(entry_idx) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8), np.empty(0)
+    if config.exit_mode not in EXIT_MODES:
+        raise ValueError(f"Unknown exit mode: {config.exit_mode}")
+
+    intrabar = config.exit_mode == "intrabar"
+    close = prices["Close"]
+    low = prices["Low"] if intrabar else close
+    high = prices["High"] if intrabar else close
+    buy_price = close[entry_idx]
+    window_end = holding_window_ends(dates, entry_idx, config.holding_period, config.holding_unit)
+    # The entry bar's range happened before its closing fill, so intrabar triggers start after it
+    lag = 1 if intrabar else 0
+    start = np.minimum(entry_idx + lag, window_end)
+    width = int((window_end - entry_idx).max())
+
+    lows = range_levels(low, width, np.minimum)
+    highs = range_levels(high, width, np.maximum)
+    stop_level = buy_price * config.stop_loss
+    target_level = buy_price * config.take_profit
+    stop_at = first_crossing(lows, start, window_end, stop_level, below=True)
+    target_at = first_crossing(highs, start, window_end, target_level, below=False)
+    stop_reason = np.full(len(entry_idx), STOP_LOSS, dtype=np.int8)
+    has_fixed_stop = stop_at < window_end
+
+    if config.trailing_stop_pct:
+        trail_at, trail_level = trailing_exits(low, high, start, window_end, buy_price,
+                                               config.trailing_stop, lag, width)
+        # On a shared bar the higher of the two stops is reached first
+        use_trail = (trail_at < stop_at) | ((trail_at == stop_at) & (trail_level > stop_level))
+        stop_at = np.where(use_trail, trail_at, stop_at)
+        stop_level = np.where(use_trail, trail_level, stop_level)
+        stop_reason[use_trail] = TRAILING_STOP
+
+    # A bar that opens at or above the target has reached it before it can fall to a stop
+    first_bar = stop_at < target_at
+    if intrabar:
+        gap_up = prices["Open"][np.minimum(target_at, len(close) - 1)] >= target_level
+        first_bar |= (stop_at == target_at) & ~gap_up
+    else:
+        first_bar |= (stop_at == target_at) | has_fixed_stop
+    has_stop = (stop_at < window_end) & first_bar
+    has_target = ~has_stop & (target_at < window_end)
+    exit_idx = np.where(has_stop, stop_at, np.where(has_target, target_at, window_end - 1))
+    reason = np.where(has_stop, stop_reason, np.where(has_target, TARGET_REACHED, MAX_HOLDING)).astype(np.int8)
+
+    sell_price = close[exit_idx]
+    if intrabar:
+        open_ = prices["Open"][exit_idx]
+        sell_price = np.where(has_stop, np.minimum(open_, stop_level), sell_price)
+        sell_price = np.where(has_target, np.maximum(open_, target_level), sell_price)
+    return exit_idx, reason, sell_price
+
+# Exit bars, reason codes and fill prices of every signal under the config's exit rules
+def config_exits(data, entry_idx, config=DEFAULT_CONFIG):
+    dates = index_ns(data.index)
+    close = data['Close'].to_numpy(dtype=np.float64)
+    if config.close_only:
+        exit_idx, reason = resolve_exits(dates, close, entry_idx, config.take_profit,
+                                         config.stop_loss, config.holding_period, config.holding_unit)
+        return exit_idx, reason, close[exit_idx]
+    prices = {col: data[col].to_numpy(dtype=np.float64) for col in ["Open", "High", "Low", "Close"]}
+    return resolve_bar_exits(dates, prices, entry_idx, config)
+
+# Build the positions frame from entry and exit bar positions (sells fill at Close by default)
+def build_positions(data, entry_idx, exit_idx, reason, sell_price=None):
+    if len(entry_idx) == 0:
+        return pd.DataFrame()
+
+    buy_dates = data.index[entry_idx]
+    sell_dates = data.index[exit_idx]
+    prices = {col: data[col].to_numpy() for col in ["Close", "Open", "High", "Low"]}
+    buy_price = prices["Close"][entry_idx]
+    sell_price = prices["Close"][exit_idx] if sell_price is None else sell_price
+
+    return pd.DataFrame({
+        'BuyDate': buy_dates,
+        'BuyPrice': buy_price,
+        'BuyOpen': prices["Open"][entry_idx],
+        'BuyHigh': prices["High"][entry_idx],
+        'BuyLow': prices["Low"][entry_idx],
+        'SellDate': sell_dates,
+        'SellPrice': sell_price,
+        'SellOpen': prices["Open"][exit_idx],
+        'SellHigh': prices["High"][exit_idx],
+        'SellLow': prices["Low"][exit_idx],
+        'HoldingDays': (sell_dates - buy_dates).days.to_numpy(dtype=np.int64),
+        'ProfitPct': (sell_price / buy_price - 1) * 100,
+        'SellReason': SELL_REASONS[reason].tolist()
+    })
+
+# Bar positions where the short MA crosses above the long MA, after the warm-up rows
+def golden_cross_entries(ma_short, ma_long, warmup):
+    return rule_entries(cross_above(ma_short, ma_long), warmup)
+
+# Positions for the given entry bars under the config's exit rules
+def positions_from_entries(data, entry_idx, config=DEFAULT_CONFIG):
+    return build_positions(data, entry_idx, *config_exits(data, entry_idx, config))
+
+# Entry bars, exit bars, exit reason codes and sell prices for one ticker (None if there is too little data)
+def backtest_signals(data, config=DEFAULT_CONFIG, profile=NULL_PROFILE, ticker=None):
+    # Need at least ma_long rows (or ma_long of elapsed time) to calculate the long MA
+    warmup = warmup_bars(data.index, config.ma_long) if len(data) else 1
+    if len(data) < warmup:
+        print(f"Not enough data for analysis (need at least {config.ma_long} days)")
+        return None
+
+    with profile.stage("moving_averages", ticker, len(data)):
+        graph = IndicatorGraph(data)
+        ma_short = graph.sma(config.ma_short)
+        ma_long = graph.sma(config.ma_long)
+    with profile.stage("signals", ticker, len(data)):
+        entry_idx = golden_cross_entries(ma_short, ma_long, warmup)
+
+    print(f"Found {len(entry_idx)} golden cross signals")
+    with profile.stage("exits", ticker, len(entry_idx)):
+        exit_idx, reason, sell_price = config_exits(data, entry_idx, config)
+    return entry_idx, exit_idx, reason, sell_price
+
+# Backtest kernel used by both the CLI and the dashboard
+def run_backtest(data, config=DEFAULT_CONFIG, profile=NULL_PROFILE, ticker=None):
+    signals = backtest_signals(data, config, profile, ticker)
+    if signals is None:
+        return pd.DataFrame()
+    with profile.stage("build_positions", ticker, len(signals[0])):
+        return build_positions(data, *signals)
+
+# Implement trading strategy on precomputed GoldenCross signals
+def implement_strategy(data, config=DEFAULT_CONFIG):
+    # Need at least ma_long days to calculate the long MA
+    warmup = warmup_bars(data.index, config.ma_long) if len(data) else 1
+    if len(data) < warmup:
+        print(f"Not enough data for analysis (need at least {config.ma_long} days)")
+        return pd.DataFrame()
+
+    signals = data['GoldenCross'].to_numpy(dtype=bool).copy()
+    signals[:warmup] = False
+    entry_idx = np.flatnonzero(signals)
+
+    print(f"Found {len(entry_idx)} golden cross signals")
+    return positions_from_entries(data, entry_idx, config)
 
 # Analyze the results
 def analyze_results(positions, ticker=""):
@@ -110,11 +382,17 @@ def analyze_results(positions, ticker=""):
         print(f"No trading signals detected for {ticker}" if ticker else "No trading signals detected")
         return positions
 
-    total_trades = len(positions)
-    win_trades = len(positions[positions['ProfitPct'] > 0])
+    from trade_stats import partial_stats
+    print_stats(partial_stats(positions, by=[]).iloc[0], ticker)
+    return positions
+
+# Print one row of (merged) partial trade statistics
+def print_stats(stats, ticker=""):
+    total_trades = int(stats['Trades'])
+    win_trades = int(stats['WinTrades'])
     loss_trades = total_trades - win_trades
     win_rate = win_trades / total_trades * 100 if total_trades > 0 else 0
-    avg_profit = positions['ProfitPct'].mean()
+    avg_profit = stats['ProfitSum'] / total_trades if total_trades > 0 else float("nan")
 
     print(f"\n===== Trading Strategy Results for {ticker} =====")
     print(f"Total Trades: {total_trades}")
@@ -122,42 +400,146 @@ def analyze_results(positions, ticker=""):
     print(f"Losing Trades: {loss_trades}")
     print(f"Average Profit: {avg_profit:.2f}%")
 
+# Run the strategy on one ticker's price data
+def backtest_ticker(ticker, data, config=DEFAULT_CONFIG, profile=NULL_PROFILE):
+    positions = run_backtest(data, config, profile, ticker)
+    if not positions.empty:
+        positions["Ticker"] = ticker
     return positions
 
+# Backtest a chunk of (ticker, data) pairs inside a worker process
+def backtest_chunk(chunk, config=DEFAULT_CONFIG, profiled=False):
+    # Worker processes cannot share the caller's profile, so their records are sent back
+    profile = RunProfile() if profiled else NULL_PROFILE
+    results = [(ticker, backtest_ticker(ticker, data, config, profile)) for ticker, data in chunk]
+    return results, profile.records if profiled else []
+
+# Print the per-ticker summary and keep tickers that produced trades, with their partial stats
+def collect_positions(ticker_positions, ticker, positions, ticker_stats):
+    from trade_stats import partial_stats
+    if not positions.empty:
+        ticker_positions[ticker] = positions
+        ticker_stats[ticker] = partial_stats(positions, by=[])
+        print_stats(ticker_stats[ticker].iloc[0], ticker)
+    else:
+        print(f"No valid trades found for {ticker}")
+
 # Main function
-def main(tickers=["MSFT", "AAPL", "TSLA"]):
-    all_positions = []
+def main(tickers=["MSFT", "AAPL", "TSLA"], provider=None, max_workers=8, processes=None, chunksize=4,
+         config=DEFAULT_CONFIG, period="5y", profile=None, compact=False, interval="1d", store=None,
+         failed=None, rate=market_data.FETCH_RATE, burst=market_data.FETCH_BURST,
+         retries=market_data.FETCH_RETRIES):
+    ticker_positions = {}
+    ticker_stats = {}
+    # Pass a RunProfile to get per-stage, per-ticker timings back in profile.report()
+    profiled = profile is not None
+    profile = profile if profiled else NULL_PROFILE
     
     if isinstance(tickers, str):
         tickers = [tickers]
     
-    for ticker in tickers:
-        print(f"\nProcessing {ticker}...")
-        data = get_stock_data(ticker)
-        if data is None:
-            continue
+    # With a ResultStore, a repeated run on unchanged data is loaded instead of recomputed
+    if store is not None:
+        from result_store import load_run, store_run
+        source = market_data.get_provider() if provider is None else provider
+        stored = load_run(store, source, tickers, config, period, interval)
+        if stored is not None:
+            print(f"Loaded {len(stored)} stored trades for {len(tickers)} tickers")
+            return stored
+    # Pass a dict as failed to get back the tickers whose download failed, with their errors
+    failed = {} if failed is None else failed
+    
+    # compact=True stores trades in a typed columnar TradeBuffer instead of per-ticker frames;
+    # rows then follow download-completion order, Ticker categories follow the input order
+    if compact:
+        from trade_records import TradeBuffer
+        trades = TradeBuffer()
+        trades.register_tickers(tickers)
+    
+    # With processes > 1, backtests are fanned out to a process pool in chunks of tickers
+    pool = ProcessPoolExecutor(max_workers=processes) if processes and processes > 1 else None
+    try:
+        futures = []
+        chunk = []
+        
+        # Downloads run concurrently, up to rate requests per second (bursts of burst); each
+        # ticker is backtested as soon as its data arrives
+        fetches = market_data.fetch_many(tickers, period, provider, max_workers=max_workers, rate=rate,
+                                         burst=burst, retries=retries, profile=profile, interval=interval)
+        for ticker, data, error in fetches:
+            print(f"\nProcessing {ticker}...")
+            if data is None:
+                print(error)
+                failed[ticker] = str(error)
+                continue
+            
+            if pool is None and compact:
+                start = len(trades)
+                signals = backtest_signals(data, config, profile, ticker)
+                if signals is not None:
+                    trades.append_trades(ticker, data, *signals)
+                collect_positions(ticker_positions, ticker, trades.to_frame(start), ticker_stats)
+                continue
+            if pool is None:
+                collect_positions(ticker_positions, ticker, backtest_ticker(ticker, data, config, profile), ticker_stats)
+                continue
             
-        data = calculate_moving_averages(data)
-        data = identify_golden_cross(data)
-        positions = implement_strategy(data)
+            chunk.append((ticker, data))
+            if len(chunk) >= chunksize:
+                futures.append(pool.submit(backtest_chunk, chunk, config, profiled))
+                chunk = []
         
-        if not positions.empty:
-            positions["Ticker"] = ticker
-            all_positions.append(positions)
-            analyze_results(positions, ticker)
-        else:
-            print(f"No valid trades found for {ticker}")
+        if pool is not None:
+            if chunk:
+                futures.append(pool.submit(backtest_chunk, chunk, config, profiled))
+            chunk_results = {}
+            for future in futures:
+                results, records = future.result()
+                chunk_results.update(results)
+                profile.extend(records)
+    finally:
+        # An exception (or KeyboardInterrupt) must not leave worker processes behind
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    
+    if pool is not None:
+        for ticker in tickers:
+            if ticker in chunk_results:
+                positions = chunk_results.pop(ticker)
+                if compact:
+                    trades.append_frame(ticker, positions)
+                collect_positions(ticker_positions, ticker, positions, ticker_stats)
+    
+    # Keep the portfolio in the order the tickers were given
+    all_positions = [ticker_positions[ticker] for ticker in tickers if ticker in ticker_positions]
     
     if all_positions:
-        portfolio_positions = pd.concat(all_positions, ignore_index=True)
+        from trade_stats import merge_stats
+        portfolio_positions = trades.to_frame() if compact else pd.concat(all_positions, ignore_index=True)
+        # Portfolio figures come from merging the per-ticker partials, not from the trades
+        stats = merge_stats(list(ticker_stats.values()), by=[]).iloc[0]
         print(f"\n=== Portfolio Summary ===")
         print(f"Total stocks analyzed: {len(tickers)}")
         print(f"Stocks with trades: {len(all_positions)}")
         print(f"Total trades: {len(portfolio_positions)}")
+        if stats['Trades']:
+            from performance import performance_metrics
+            risk = performance_metrics(portfolio_positions, by=[]).iloc[0]
+            print(f"Win rate: {stats['WinTrades'] / stats['Trades'] * 100:.2f}%")
+            print(f"Average profit: {stats['ProfitSum'] / stats['Trades']:.2f}%")
+            # Spans under a year are not annualized, so they report their total return
+            growth = (f"CAGR: {risk['CAGR']:.2f}%" if pd.notna(risk['CAGR'])
+                      else f"Total return: {risk['TotalReturn']:.2f}%")
+            print(f"{growth}, max drawdown: {risk['MaxDrawdown']:.2f}%, "
+                  f"Sharpe: {risk['Sharpe']:.2f}, Sortino: {risk['Sortino']:.2f}, exposure: {risk['Exposure']:.1f}%")
     else:
         portfolio_positions = pd.DataFrame()
         print("No trades generated for any stock")
     
+    # Runs with failed downloads are incomplete and are not kept
+    if store is not None and not failed:
+        store_run(store, source, tickers, portfolio_positions, config, period, interval)
+    
     return portfolio_positions
 
 # Only run this if the script is executed directly